@@ -1,20 +1,1812 @@
+import time
+STARTUP_T0 = time.perf_counter()
 import tkinter as tk
 from tkinter import ttk, messagebox, font, filedialog, simpledialog
 import textwrap
 import json
 import threading
 import os
-import time
-import requests
+import sys
+import argparse
+import importlib
+import hashlib
+import re
+import random
+import base64
+import queue
+from collections import OrderedDict, deque
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont, ImageTk
-from openai import OpenAI  # Legacy import style that works for your version
+# openai and PIL are imported on first use (or by the idle-time preloader),
+# so none of them are on the path to the first prompt.
 
 CONFIG_FILE = "chatlpt_config.json"
+SYSTEM_PROMPT = "You are a helpful assistant."
+CHAT_TEMPERATURE = 0.8
+RESPONSE_CACHE_DIR = "chatlpt_cache"
+IMAGE_STORE_DIR = "chatlpt_images"
+MAX_IMAGE_BYTES = 32 * 1024 * 1024
+HISTORY_CHUNK = 100  # messages rendered per batch when opening or scrolling back through a chat
+WRAP_COLUMNS = 80  # replies are wrapped to this width, or narrower if the window is
+AUTOSAVE_DIR = "chatlpt_autosave"
+LPT_VERSION = 2
+LPT_INDEX_STRIDE = 64  # the tail index records the byte offset of every 64th message
+STARTUP_TARGET = 0.5  # seconds from launch to the first prompt
+PRELOAD_MODULES = ("openai", "PIL.Image", "PIL.ImageTk")
+DEFAULT_API_BASE_URL = "https://api.openai.com/v1"
+TELEMETRY_FILE = "chatlpt_telemetry.jsonl"
+TELEMETRY_WINDOW = 500  # requests kept in memory for the Performance window
+HEARTBEAT_MS = 50  # main-loop stall is how late this after() tick fires
+SEARCH_INDEX_FILE = "chatlpt_search.db"
+SEARCH_POLL_SECONDS = 30  # how often known and watched .lpt files are checked for changes
+SEARCH_RESULTS = 200
+HIBERNATE_CHECK_MS = 30000
+TEXT_BYTES_PER_CHAR = 3  # rough Tk text cost per character, undo stack included
+MESSAGE_OVERHEAD_BYTES = 200  # dict, strings and token count per message
+IMAGE_BATCH_WINDOW = 0.01  # seconds image requests wait to be batched with others
+IMAGE_BATCH_MAX = 8
+ASCII_ART_TIMEOUT = 30  # seconds a request waits for the image workers
+CRT_DEFAULT_SIZE = (640, 480)
+CRT_PHOSPHOR = ("#001400", "#22e055", "#d8ffe0")  # dark, mid and bright of the green ramp
+CRT_SCANLINE = 0.55  # brightness of the dark row in each scanline pair
+CRT_BLOOM_THRESHOLD = 150
+CRT_BLOOM_RADIUS = 6
+CRT_CURVATURE = 0.08
+CRT_MESH_CELLS = 16
+UI_TICK_MIN_MS = 16  # the UI queue drains at most this often
+UI_TICK_MAX_MS = 100  # ...and at least this often while it has work
+UI_TICK_IDLE_MS = 50  # tick when nothing has been queued for a while
+UI_HIDDEN_BUDGET = 0.008  # seconds per tick spent on updates for hidden tabs
+ASCII_CHARSETS = {
+    "standard": "@%#*+=-:. ",
+    "detailed": "$@B%8&WM#*oahkbdpqwmZO0QLCJUYXzcvunxrjft/\\|()1{}[]?-_+~<>i!lI;:,\"^`'. ",
+    "blocks": "\u2588\u2593\u2592\u2591 ",
+}
+CONTEXT_POLICIES = ("sliding", "last_n", "summarize")
+# Longest prefix wins; unknown models get DEFAULT_CONTEXT_WINDOW.
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-instruct": 4096,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-5": 400000,
+    "o1": 200000,
+    "o3": 200000,
+    "o4": 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+MODEL_CATALOG_FILE = "chatlpt_models.json"
+VISION_MODEL_PREFIXES = ("gpt-4o", "gpt-4-turbo", "gpt-4.1", "gpt-4.5", "gpt-5", "o1", "o3", "o4")
+IMAGE_MODEL_PREFIXES = ("dall-e", "gpt-image")
+MESSAGE_TOKEN_OVERHEAD = 4  # role and separators per chat message
+SUMMARY_TOKEN_RESERVE = 512  # room kept for the summary message under the "summarize" policy
+
+
+def lazy_import(name):
+    # importlib caches in sys.modules, so only the first call for a module pays for it.
+    module = sys.modules.get(name)
+    if module is None:
+        module = importlib.import_module(name)
+    return module
+
+
+class StartupProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.last = STARTUP_T0
+        self.phases = []
+        self.lock = threading.Lock()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        with self.lock:
+            self.phases.append((phase, now - self.last))
+            self.last = now
+        return now - STARTUP_T0
+
+    def timed(self, phase, fn):
+        start = time.perf_counter()
+        result = fn()
+        with self.lock:
+            self.phases.append((phase, time.perf_counter() - start))
+        return result
+
+    def report(self, first_prompt):
+        lines = ["ChatLPT startup profile"]
+        with self.lock:
+            for phase, seconds in self.phases:
+                lines.append(f"  {phase:<32} {seconds * 1000:8.1f} ms")
+        verdict = "OK" if first_prompt <= STARTUP_TARGET else "OVER TARGET"
+        lines.append(f"  {'time to first prompt':<32} {first_prompt * 1000:8.1f} ms "
+                     f"(target {STARTUP_TARGET * 1000:.0f} ms: {verdict})")
+        return "\n".join(lines)
+
+
+def context_window(model):
+    best = ""
+    for prefix in MODEL_CONTEXT_WINDOWS:
+        if model.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return MODEL_CONTEXT_WINDOWS[best] if best else DEFAULT_CONTEXT_WINDOW
+
+
+def model_metadata(model):
+    # The OpenAI list only has ids; compatible servers often add a context length.
+    extra = getattr(model, "model_extra", None) or {}
+    reported = [extra[k] for k in ("context_window", "context_length", "max_model_len") if isinstance(extra.get(k), int)]
+    return {
+        "context_window": reported[0] if reported else context_window(model.id),
+        "vision": model.id.startswith(VISION_MODEL_PREFIXES),
+        "image_generation": model.id.startswith(IMAGE_MODEL_PREFIXES),
+        "owned_by": getattr(model, "owned_by", None),
+        "created": getattr(model, "created", None),
+    }
+
+
+class ModelCatalog:
+    # The endpoint's model list with per-model metadata, persisted between sessions. Readers
+    # always get the saved list at once; a refresh is due once it is older than the TTL
+    # (stale-while-revalidate), or when the API endpoint changed.
+    def __init__(self, path=MODEL_CATALOG_FILE, ttl=24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.data = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            if self.data is None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self.data = json.load(f)
+                except (OSError, ValueError):
+                    self.data = {"endpoint": None, "fetched": 0, "models": {}}
+            return self.data
+
+    def models(self, endpoint=None):
+        data = self.load()
+        return data["models"] if data["endpoint"] == (endpoint or None) else {}
+
+    def age(self):
+        return time.time() - self.load()["fetched"]
+
+    def is_stale(self, endpoint=None):
+        return not self.models(endpoint) or self.age() > self.ttl
+
+    def begin_refresh(self):
+        with self.lock:
+            if self.refreshing:
+                return False
+            self.refreshing = True
+            return True
+
+    def end_refresh(self):
+        with self.lock:
+            self.refreshing = False
+
+    def update(self, endpoint, api_models):
+        data = {"endpoint": endpoint or None, "fetched": time.time(),
+                "models": {m.id: model_metadata(m) for m in sorted(api_models, key=lambda m: m.id)}}
+        with self.lock:
+            self.data = data
+        try:
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # Still cached for this session.
+
+    def context_window(self, model, endpoint=None):
+        meta = self.models(endpoint).get(model)
+        return meta["context_window"] if meta else context_window(model)
+
+
+_token_encoding = None
+
+
+def count_tokens(text):
+    global _token_encoding
+    if _token_encoding is None:
+        try:
+            # Optional; exact token counts when installed.
+            _token_encoding = lazy_import("tiktoken").get_encoding("cl100k_base")
+        except ImportError:
+            _token_encoding = False
+    if _token_encoding is False:
+        return len(text) // 4 + 1
+    return len(_token_encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message):
+    return count_tokens(message.get("content") or "") + MESSAGE_TOKEN_OVERHEAD
+
+
+class ChatHistory(list):
+    # A tab's message list that keeps a token count per message, computed at most once,
+    # so trimming to the context window never re-tokenizes the history. Messages loaded
+    # from a file are counted lazily, newest first, as trimming reaches them.
+    def __init__(self, messages=()):
+        super().__init__(messages)
+        self.token_counts = [None] * len(self)
+        self.summary = None  # (number of messages covered, summary message, its token count)
+        self.journal = None
+
+    def tokens(self, index):
+        count = self.token_counts[index]
+        if count is None:
+            count = message_tokens(self[index])
+            self.token_counts[index] = count
+        return count
+
+    @property
+    def total_tokens(self):
+        return sum(self.tokens(i) for i in range(len(self)))
+
+    def append(self, message):
+        super().append(message)
+        self.token_counts.append(message_tokens(message))
+        if self.journal is not None:
+            self.journal.append(message)
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def pop(self, index=-1):
+        message = super().pop(index)
+        self.token_counts.pop(index)
+        if self.summary and self.summary[0] > len(self):
+            self.summary = None
+        if self.journal is not None:
+            if index == -1 or index == len(self):
+                self.journal.truncate(len(self))  # cancelled turns: keeps the journal append-only
+            else:
+                self.journal.rewrite(self)
+        return message
+
+    def clear(self):
+        super().clear()
+        self.token_counts = []
+        self.summary = None
+        if self.journal is not None:
+            self.journal.rewrite(self)
+
+    def fit(self, pinned, budget, policy, keep_last):
+        used = sum(self.tokens(i) for i in range(pinned))
+        start = len(self)
+        floor = pinned
+        if policy == "last_n":
+            floor = max(pinned, len(self) - keep_last)
+        while start > floor and used + self.tokens(start - 1) <= budget:
+            start -= 1
+            used += self.tokens(start)
+        if start == len(self) and start > floor:
+            start -= 1  # Always send the newest message, even if it alone overflows.
+            used += self.tokens(start)
+        return start, used
+
+    def build(self, budget, policy="sliding", keep_last=20, summarize=None):
+        # Returns (messages to send, prompt token count). A leading system message is always pinned.
+        pinned = 1 if self and self[0].get("role") == "system" else 0
+        start, used = self.fit(pinned, budget, policy, keep_last)
+        summary = None
+        if policy == "summarize" and summarize is not None and start > pinned:
+            start, used = self.fit(pinned, budget - SUMMARY_TOKEN_RESERVE, policy, keep_last)
+            summary = self.summary_message(pinned, start, summarize)
+        head = [{"role": m["role"], "content": m["content"]} for m in self[:pinned]]
+        tail = [{"role": m["role"], "content": m["content"]} for m in self[start:]]
+        if summary is not None:
+            message, tokens = summary
+            return head + [message] + tail, used + tokens
+        return head + tail, used
+
+    def summary_message(self, pinned, start, summarize):
+        if self.summary and self.summary[0] >= start:
+            return self.summary[1], self.summary[2]
+        # Only the turns not yet covered by the previous summary are sent to be folded in.
+        covered = self.summary[0] if self.summary else pinned
+        earlier = self.summary[1]["content"] if self.summary else ""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in self[covered:start])
+        try:
+            text = summarize(earlier, transcript)
+        except RequestCancelled:
+            raise
+        except Exception:
+            return None
+        message = {"role": "system", "content": f"Summary of the earlier conversation: {text}"}
+        self.summary = (start, message, message_tokens(message))
+        return message, self.summary[2]
+
+
+def lpt_line(record):
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def lpt_is_journal(path):
+    # Version 1 files are a single JSON array; version 2 files start with a header object.
+    with open(path, "rb") as f:
+        head = f.read(64).lstrip()
+    return not head.startswith(b"[")
+
+
+def read_lpt(path):
+    # Returns (messages, journal state) for either format; the state is None for version 1 files.
+    if not lpt_is_journal(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f), None
+    messages = []
+    offsets = []
+    index_at = None
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != "chatlpt":
+            raise ValueError("Not a ChatLPT file.")
+        while True:
+            pos = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # A torn final line from a crash; everything before it is intact.
+            if "index" in record:
+                index_at = pos
+                break
+            if "truncate" in record:
+                # Messages dropped after they were written (a cancelled turn).
+                del messages[record["truncate"]:]
+                del offsets[(len(messages) + LPT_INDEX_STRIDE - 1) // LPT_INDEX_STRIDE:]
+                continue
+            if len(messages) % LPT_INDEX_STRIDE == 0:
+                offsets.append(pos)
+            messages.append(record)
+        end = pos
+    return messages, {"count": len(messages), "offsets": offsets, "index_at": index_at, "end": end}
+
+
+def read_lpt_tail(path, count):
+    # Returns (last `count` messages, total message count or None) without parsing the
+    # whole file: through the tail index when present, otherwise by reading backwards.
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(max(0, size - 64 * 1024))
+        last_block = f.read()
+        last_line = last_block.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+        try:
+            record = json.loads(last_line)
+        except ValueError:
+            record = {}
+        index = record.get("index")
+        slot = max(0, index["count"] - count) // index["stride"] if index else 0
+        if index and slot >= len(index["offsets"]):
+            # Nothing indexed (a header-only or fully truncated journal): scan it instead.
+            messages, state = read_lpt(path)
+            return messages[-count:], state["count"]
+        if index:
+            total = index["count"]
+            first = max(0, total - count)
+            base = first - first % index["stride"]
+            f.seek(index["offsets"][slot])
+            messages = []
+            for line in f:
+                record = json.loads(line)
+                if "index" in record:
+                    break
+                if "truncate" in record:
+                    del messages[max(0, record["truncate"] - base):]
+                    continue
+                messages.append(record)
+            return messages[first - base:], total
+        lines = []
+        pos = size
+        remainder = b""
+        while pos > 0 and len(lines) <= count:
+            step = min(64 * 1024, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step) + remainder
+            parts = block.split(b"\n")
+            remainder = parts[0]
+            lines[:0] = [p for p in parts[1:] if p.strip()]
+        if pos == 0 and remainder.strip():
+            lines.insert(0, remainder)
+    messages = []
+    reached_header = False
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "format" in record:
+            reached_header = True
+        elif "truncate" in record:
+            # Message positions are only known from the start of the file.
+            messages, state = read_lpt(path)
+            return messages[-count:], state["count"]
+        elif "role" in record:
+            messages.append(record)
+    total = len(messages) if reached_header else None
+    return messages[-count:], total
+
+
+def lock_file(path):
+    # Exclusive lock held for as long as the returned file stays open; raises OSError
+    # if another process holds it.
+    f = open(path, "a+b")
+    f.seek(0)
+    try:
+        if os.name == "nt":
+            msvcrt = lazy_import("msvcrt")
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl = lazy_import("fcntl")
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise
+    return f
+
+
+def autosave_lock_path(owner):
+    return os.path.join(AUTOSAVE_DIR, f"instance-{owner}.lock")
+
+
+class JournalWriter:
+    # One background thread does all chat file I/O. Bursts of queued appends are written
+    # together and each touched file is fsynced once per burst.
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, fn):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        self.queue.put(fn)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            touched = set()
+            for fn in batch:
+                if getattr(fn, "barrier", False):
+                    # Anything waiting on the writer should see the data on disk.
+                    for journal in touched:
+                        journal.sync()
+                    touched.clear()
+                try:
+                    journal = fn()
+                except Exception:
+                    journal = None  # Autosave must never take the UI down; the next write retries.
+                if isinstance(journal, ChatJournal):
+                    touched.add(journal)
+            for journal in touched:
+                journal.sync()
+
+    def call(self, fn, timeout=None):
+        # Runs fn on the writer thread after everything already queued, and waits for it.
+        done = threading.Event()
+        result = {}
+
+        def task():
+            try:
+                result["value"] = fn()
+                return result["value"]
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        task.barrier = True
+        self.submit(task)
+        done.wait(timeout)
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def flush(self, timeout=5):
+        self.call(lambda: None, timeout)
+
+
+class ChatJournal:
+    # Append-only .lpt v2 file for one tab: a header line, one JSON line per message and,
+    # once the tab is closed, a tail index line that the next append truncates away.
+    def __init__(self, path, writer, autosave=False, seed=(), state=None):
+        self.path = path
+        self.writer = writer
+        self.autosave = autosave
+        self.seed = list(seed)  # messages to write first if the file does not exist yet
+        self.file = None
+        self.count = state["count"] if state else 0
+        self.offsets = list(state["offsets"]) if state else []
+        self.truncate_at = state["end"] if state else None
+
+    def append(self, message):
+        self.writer.submit(lambda: self.write_message(message))
+
+    def truncate(self, count):
+        self.writer.submit(lambda: self.write_truncate(count))
+
+    def rewrite(self, messages, path=None):
+        snapshot = list(messages)
+        self.writer.submit(lambda: self.write_all(snapshot, path))
+
+    def close(self):
+        self.writer.submit(self.write_index)
+
+    def delete(self):
+        self.writer.submit(self.remove)
+
+    def open_file(self):
+        if self.file is not None:
+            return
+        if os.path.exists(self.path):
+            self.file = open(self.path, "r+b")
+            if self.truncate_at is not None:
+                self.file.truncate(self.truncate_at)
+            self.file.seek(0, 2)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.file = open(self.path, "w+b")
+            self.file.write(lpt_line({"format": "chatlpt", "version": LPT_VERSION, "created": time.time()}))
+            self.count = 0
+            self.offsets = []
+            for message in self.seed:
+                self.write_line(message)
+        self.seed = []
+
+    def write_line(self, message):
+        if self.count % LPT_INDEX_STRIDE == 0:
+            self.offsets.append(self.file.tell())
+        self.file.write(lpt_line(message))
+        self.count += 1
+
+    def write_message(self, message):
+        self.open_file()
+        self.write_line(message)
+        return self
+
+    def write_truncate(self, count):
+        self.open_file()
+        self.file.write(lpt_line({"truncate": count}))
+        self.count = count
+        del self.offsets[(count + LPT_INDEX_STRIDE - 1) // LPT_INDEX_STRIDE:]
+        return self
+
+    def write_all(self, messages, path=None):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        old_path = self.path
+        new_path = path or self.path
+        tmp_path = f"{new_path}.tmp"
+        self.path = tmp_path
+        self.seed = messages
+        self.truncate_at = None
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        self.open_file()
+        self.sync()
+        self.file.close()
+        self.file = None
+        os.replace(tmp_path, new_path)
+        self.path = new_path
+        self.truncate_at = None
+        if self.autosave and new_path != old_path:
+            # Saved somewhere real: the autosave copy is no longer needed.
+            self.autosave = False
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        return None
+
+    def write_index(self):
+        if self.file is None:
+            return None  # Untouched since it was opened, so any existing index is still valid.
+        self.truncate_at = self.file.tell()
+        self.file.write(lpt_line({"index": {"count": self.count, "stride": LPT_INDEX_STRIDE,
+                                            "offsets": self.offsets}}))
+        self.sync()
+        self.file.close()
+        self.file = None
+        return None
+
+    def remove(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return None
+
+    def sync(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, title TEXT,
+                                  mtime REAL, size INTEGER, count INTEGER, last_hash TEXT);
+CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, file_id INTEGER, idx INTEGER, role TEXT, content TEXT);
+CREATE INDEX IF NOT EXISTS messages_file ON messages(file_id, idx);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+def message_hash(msg):
+    return hashlib.sha1(json.dumps(msg, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def searchable(msg):
+    # System prompts and ASCII art renderings of images are noise in search results.
+    return msg.get("role") != "system" and not msg.get("image") and bool(msg.get("content"))
+
+
+def fts_query(text):
+    # Every word must match; the last one as a prefix so results update while typing.
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    # SQLite FTS5 index of saved chats, one row per message. A single indexer thread owns
+    # the write connection and picks up saves, watched folders and appends to known
+    # files; queries use their own connection (WAL), so they never wait on a reindex.
+    def __init__(self, path=SEARCH_INDEX_FILE, watch_dirs=(), poll_seconds=SEARCH_POLL_SECONDS):
+        self.path = path
+        self.watch_dirs = list(watch_dirs)
+        self.poll_seconds = poll_seconds
+        self.tasks = queue.Queue()
+        self.thread = None
+        self.reader = None
+        self.lock = threading.Lock()
+        self.error = None
+
+    def connect(self):
+        conn = lazy_import("sqlite3").connect(self.path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SEARCH_SCHEMA)
+        return conn
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.tasks.put(("stop", None))
+
+    def index(self, path):
+        self.start()
+        self.tasks.put(("file", path))
+
+    def watch(self, directory):
+        directory = os.path.abspath(directory)
+        if directory not in self.watch_dirs:
+            self.watch_dirs.append(directory)
+        self.start()
+        self.tasks.put(("scan", None))
+
+    def run(self):
+        try:
+            conn = self.connect()
+        except Exception as e:
+            self.error = str(e)  # e.g. an SQLite build without FTS5
+            return
+        next_scan = time.monotonic()
+        while True:
+            try:
+                kind, arg = self.tasks.get(timeout=max(0.0, next_scan - time.monotonic()))
+            except queue.Empty:
+                kind, arg = "scan", None
+            if kind == "stop":
+                conn.close()
+                return
+            try:
+                if kind == "file":
+                    self.index_file(conn, arg)
+                else:
+                    self.scan(conn)
+                    next_scan = time.monotonic() + self.poll_seconds
+            except Exception:
+                pass  # A bad file is retried on the next scan once it changes.
+
+    def scan(self, conn):
+        for directory in list(self.watch_dirs):
+            for dirpath, dirnames, filenames in os.walk(directory):
+                for name in filenames:
+                    if name.endswith(".lpt"):
+                        self.index_file(conn, os.path.join(dirpath, name))
+        for (path,) in conn.execute("SELECT path FROM files").fetchall():
+            self.index_file(conn, path)
+
+    def index_file(self, conn, path):
+        # Unchanged files cost one stat(); a journal that only grew has just its new messages added.
+        path = os.path.abspath(path)
+        row = conn.execute("SELECT id, mtime, size, count, last_hash FROM files WHERE path = ?", (path,)).fetchone()
+        try:
+            st = os.stat(path)
+        except OSError:
+            if row is not None:
+                with conn:
+                    conn.execute("DELETE FROM messages WHERE file_id = ?", (row[0],))
+                    conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+            return
+        if row is not None and row[1] == st.st_mtime and row[2] == st.st_size:
+            return
+        messages, state = read_lpt(path)
+        title = os.path.basename(path).rsplit(".", 1)[0]
+        last_hash = message_hash(messages[-1]) if messages else None
+        start = 0
+        with conn:
+            if row is None:
+                file_id = conn.execute("INSERT INTO files (path, title) VALUES (?, ?)", (path, title)).lastrowid
+            else:
+                file_id, count = row[0], row[3]
+                if state is not None and 0 < count <= len(messages) and message_hash(messages[count - 1]) == row[4]:
+                    start = count
+                else:
+                    conn.execute("DELETE FROM messages WHERE file_id = ?", (file_id,))
+            conn.executemany("INSERT INTO messages (file_id, idx, role, content) VALUES (?, ?, ?, ?)",
+                             [(file_id, i, msg.get("role"), msg["content"])
+                              for i, msg in enumerate(messages[start:], start) if searchable(msg)])
+            conn.execute("UPDATE files SET title = ?, mtime = ?, size = ?, count = ?, last_hash = ? WHERE id = ?",
+                         (title, st.st_mtime, st.st_size, len(messages), last_hash, file_id))
+
+    def search(self, text, limit=SEARCH_RESULTS):
+        # Returns [(path, title, message index, role, snippet)], best match first.
+        query = fts_query(text)
+        if not query:
+            return []
+        with self.lock:
+            if self.reader is None:
+                self.reader = self.connect()
+            return self.reader.execute(
+                "SELECT f.path, f.title, m.idx, m.role, snippet(messages_fts, 0, '[', ']', '...', 12) "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid JOIN files f ON f.id = m.file_id "
+                "WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?", (query, limit)).fetchall()
+
+    def stats(self):
+        with self.lock:
+            if self.reader is None:
+                self.reader = self.connect()
+            files, messages = self.reader.execute(
+                "SELECT (SELECT COUNT(*) FROM files), (SELECT COUNT(*) FROM messages)").fetchone()
+        return {"files": files, "messages": messages}
+
+
+class LRUCache:
+    def __init__(self, max_items=128):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+ascii_art_cache = LRUCache(max_items=64)
+format_cache = LRUCache(max_items=512)
+
+HEADING_RE = re.compile(r"#{1,6}\s+")
+INLINE_RE = re.compile(r"`([^`\n]+)`|\*\*([^*\n]+)\*\*|(?<![\w*])\*([^*\s][^*\n]*?)\*(?![\w*])"
+                       r"|(?<!\w)_([^_\s][^_\n]*?)_(?!\w)")
+INLINE_TAGS = ("md_code", "md_bold", "md_italic", "md_italic")
+FORMAT_TAGS = ("md_heading", "md_code", "md_fence", "md_bold", "md_italic")
+
+
+class FormattedText(str):
+    # Display text plus sorted (start, end, tag) spans. Wrapping only turns spaces into
+    # newlines, so a message has the same length at every width and its spans stay valid.
+    spans = ()
+    source = None  # the text it was formatted from, for re-wrapping at another width
+    regions = ()  # (start, end, source) of each formatted message in joined history text
+    pending_art = None  # future of the ASCII art that replaces this placeholder
+    images = ()  # (start, end, future) of each image placeholder in joined history text
+
+
+def wrap_line(line, width):
+    if len(line) <= width:
+        return line
+    out = []
+    pos = 0
+    while len(line) - pos > width:
+        cut = line.rfind(" ", pos, pos + width + 1)
+        if cut <= pos:
+            cut = line.find(" ", pos + width)  # a word longer than the line stays whole
+            if cut == -1:
+                break
+        out.append(line[pos:cut])
+        pos = cut + 1
+    out.append(line[pos:])
+    return "\n".join(out)
+
+
+def inline_markup(line):
+    parts = []
+    spans = []
+    pos = 0
+    last = 0
+    for match in INLINE_RE.finditer(line):
+        parts.append(line[last:match.start()])
+        pos += match.start() - last
+        inner = match.group(match.lastindex)
+        spans.append((pos, pos + len(inner), INLINE_TAGS[match.lastindex - 1]))
+        parts.append(inner)
+        pos += len(inner)
+        last = match.end()
+    parts.append(line[last:])
+    return "".join(parts), spans
+
+
+def format_lines(lines, width, in_code=False):
+    # Formats whole lines (without their newlines); in_code carries an open code fence
+    # from one call to the next, so a streamed reply formats the same as a finished one.
+    out = []
+    spans = []
+    pos = 0
+    for line in lines:
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+            text, line_spans = line, [(0, len(line), "md_fence")]
+        elif in_code:
+            text, line_spans = line, [(0, len(line), "md_code")]  # code is never wrapped
+        else:
+            heading = HEADING_RE.match(line)
+            if heading:
+                text = line[heading.end():]
+                line_spans = [(0, len(text), "md_heading")]
+            else:
+                text, line_spans = inline_markup(line)
+            text = wrap_line(text, width)
+        spans.extend((pos + start, pos + end, tag) for start, end, tag in line_spans if end > start)
+        out.append(text)
+        pos += len(text) + 1
+    return "\n".join(out), spans, in_code
+
+
+def format_message(text, width):
+    key = (text, width)
+    formatted = format_cache.get(key)
+    if formatted is None:
+        display, spans, _ = format_lines(text.split("\n"), width)
+        formatted = FormattedText(display)
+        formatted.spans = tuple(spans)
+        formatted.source = text
+        format_cache.put(key, formatted)
+    return formatted
+
+
+def join_formatted(parts):
+    # Concatenates plain and formatted strings, keeping spans and message regions.
+    spans = []
+    regions = []
+    images = []
+    pos = 0
+    for part in parts:
+        spans.extend((pos + start, pos + end, tag) for start, end, tag in getattr(part, "spans", ()))
+        if part and getattr(part, "source", None) is not None:
+            regions.append((pos, pos + len(part), part.source))
+        if getattr(part, "pending_art", None) is not None:
+            images.append((pos, pos + len(part), part.pending_art))
+        pos += len(part)
+    joined = FormattedText("".join(parts))
+    joined.spans = tuple(spans)
+    joined.regions = tuple(regions)
+    joined.images = tuple(images)
+    return joined
+
+
+class StreamFormatter:
+    # Formats a streamed reply one completed line at a time, so each chunk is formatted
+    # once; the unfinished last line is shown as raw text until its newline arrives.
+    def __init__(self, width):
+        self.width = width
+        self.in_code = False
+        self.partial = ""
+        self.source = []
+
+    def feed(self, text):
+        # Returns (formatted text of the lines completed by this chunk, raw partial line).
+        self.source.append(text)
+        lines = (self.partial + text).split("\n")
+        self.partial = lines.pop()
+        if not lines:
+            return None, self.partial
+        display, spans, self.in_code = format_lines(lines, self.width, self.in_code)
+        done = FormattedText(display + "\n")
+        done.spans = tuple(spans)
+        return done, self.partial
+
+    def finish(self):
+        if not self.partial:
+            return None
+        display, spans, self.in_code = format_lines([self.partial], self.width, self.in_code)
+        self.partial = ""
+        done = FormattedText(display)
+        done.spans = tuple(spans)
+        return done
+
+
+class ResponseCache:
+    # Content-addressed cache for API results: an in-memory LRU bounded by size in bytes,
+    # backed by one JSON file per entry on disk. Identical requests already in flight are
+    # coalesced, so the second caller waits for the first instead of calling the API again.
+    def __init__(self, directory=RESPONSE_CACHE_DIR, max_bytes=32 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(**params):
+        data = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def remember(self, key, value, expires):
+        size = len(value.encode("utf-8"))
+        if key in self.memory:
+            self.memory_bytes -= self.memory.pop(key)[2]
+        self.memory[key] = (expires, value, size)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_bytes and self.memory:
+            self.memory_bytes -= self.memory.popitem(last=False)[1][2]
+
+    def lookup(self, key):
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self.memory.move_to_end(key)
+                return entry[1]
+            self.memory_bytes -= self.memory.pop(key)[2]
+        path = self.path_for(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires", 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        self.remember(key, entry["value"], entry["expires"])
+        return entry["value"]
+
+    def get(self, key):
+        with self.lock:
+            value = self.lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        expires = time.time() + (ttl or self.ttl)
+        with self.lock:
+            self.remember(key, value, expires)
+        path = self.path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"expires": expires, "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # The memory tier still has it.
+
+    def get_or_compute(self, key, compute, job=None, ttl=None):
+        while True:
+            with self.lock:
+                value = self.lookup(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+                flight = self.inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = {"done": threading.Event(), "value": None, "error": None}
+                    self.inflight[key] = flight
+                    self.misses += 1
+            if leader:
+                break
+            while not flight["done"].wait(0.1):
+                if job is not None:
+                    job.check()
+            if flight["error"] is None:
+                with self.lock:
+                    self.hits += 1
+                return flight["value"]
+            if not isinstance(flight["error"], RequestCancelled):
+                raise flight["error"]
+            # The leader was cancelled; go round again and make the request ourselves.
+        try:
+            value = compute()
+            flight["value"] = value
+            self.put(key, value, ttl)
+            return value
+        except BaseException as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight["done"].set()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.memory),
+                    "bytes": self.memory_bytes, "inflight": len(self.inflight)}
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+            self.hits = 0
+            self.misses = 0
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for name in filenames:
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+
+
+def image_digest(img):
+    digest = img.info.get("chatlpt_digest")
+    if digest is None:
+        digest = hashlib.sha1(img.tobytes()).hexdigest()
+        img.info["chatlpt_digest"] = digest
+    return digest
+
+
+class HttpPool:
+    # One thread-safe HTTP connection pool for everything the app fetches: OpenAI API calls
+    # and image downloads share its keep-alive connections, and warm() opens a connection
+    # ahead of time, so the first request after startup or an idle spell skips DNS and TLS setup.
+    def __init__(self, max_connections=8, keepalive=60, connect_timeout=5, read_timeout=60):
+        self.max_connections = max_connections
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.client = None
+        self.api_clients = {}
+        self.last_used = None
+        self.warming = False
+        self.lock = threading.Lock()
+
+    def timeout(self):
+        return lazy_import("openai").Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def http_client(self):
+        with self.lock:
+            if self.client is None:
+                limits = lazy_import("httpx").Limits(max_connections=self.max_connections,
+                                                     max_keepalive_connections=self.max_connections,
+                                                     keepalive_expiry=self.keepalive)
+                self.client = lazy_import("openai").DefaultHttpxClient(
+                    limits=limits, timeout=self.timeout(), event_hooks={"request": [self.touch]})
+            return self.client
+
+    def api_client(self, api_key, base_url=None):
+        # OpenAI clients are thin wrappers around the shared pool. Retries are handled by
+        # the scheduler, so the client itself must not retry.
+        http_client = self.http_client()
+        key = (api_key, base_url or None)
+        with self.lock:
+            client = self.api_clients.get(key)
+            if client is None:
+                client = lazy_import("openai").OpenAI(api_key=api_key, base_url=base_url or None, max_retries=0,
+                                                      timeout=self.timeout(), http_client=http_client)
+                self.api_clients = {key: client}  # only the current key and endpoint are kept
+            return client
+
+    def touch(self, request=None):
+        self.last_used = time.monotonic()
+
+    def needs_warmup(self):
+        # Pooled connections are closed after `keepalive` idle seconds.
+        return self.last_used is None or time.monotonic() - self.last_used > self.keepalive
+
+    def warm(self, base_url=None):
+        with self.lock:
+            if self.warming or not self.needs_warmup():
+                return False
+            self.warming = True
+
+        def run():
+            # The reply to an unauthenticated HEAD does not matter; the pooled connection does.
+            try:
+                self.http_client().head(base_url or DEFAULT_API_BASE_URL)
+            except Exception:
+                pass
+            finally:
+                self.warming = False
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def close(self):
+        with self.lock:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+            self.api_clients = {}
+
+
+class ImagePipeline:
+    # Downloads generated images over the shared HTTP pool, keeps every image on disk
+    # so saved chats can re-render it offline, and decodes at reduced resolution when
+    # only an ASCII thumbnail is needed.
+    def __init__(self, http, directory=IMAGE_STORE_DIR):
+        self.http = http
+        self.directory = directory
+
+    def download(self, url, job=None):
+        with self.http.http_client().stream("GET", url) as r:
+            r.raise_for_status()
+            buf = BytesIO()
+            for chunk in r.iter_bytes(64 * 1024):
+                if job is not None:
+                    job.check()
+                buf.write(chunk)
+                if buf.tell() > MAX_IMAGE_BYTES:
+                    raise Exception("Image download is too large.")
+        return buf.getvalue()
+
+    def path_for(self, image_key):
+        return os.path.join(self.directory, f"{image_key}.img")
+
+    def has(self, image_key):
+        return os.path.exists(self.path_for(image_key))
+
+    def store(self, params, data):
+        # Keyed by the request parameters plus the content, so regenerating the same prompt
+        # never changes the picture an older saved chat points at.
+        image_key = f"{ResponseCache.make_key(**params)[:32]}-{hashlib.sha1(data).hexdigest()[:12]}"
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path_for(image_key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path_for(image_key))
+        return image_key
+
+
+def decode_image(data, ascii_width=None):
+    img = lazy_import("PIL.Image").open(BytesIO(data))
+    if ascii_width:
+        # Twice the target size is plenty for the box filter in resize().
+        target = (ascii_width * 2, ascii_width * 2)
+        img.draft("RGB", target)  # JPEG only: DCT-domain downscale while decoding
+        factor = min(img.width // target[0], img.height // target[1])
+        if factor > 1:
+            img = img.reduce(factor)
+    img.load()
+    return img
+
+
+def ascii_art_batch(requests):
+    # Runs in a worker process: [(image path, width, charset, dither)] -> [(ok, art or error)].
+    results = []
+    for path, width, charset, dither in requests:
+        try:
+            with open(path, "rb") as f:
+                img = decode_image(f.read(), width)
+            results.append((True, render_ascii_art(img, width, charset, dither)))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def decode_batch(paths):
+    # Runs in a worker process: [image path] -> [(ok, full-size image or error)]; the image
+    # is pickled back for the CRT window.
+    results = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                results.append((True, decode_image(f.read())))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class ImageWorkerPool:
+    # Decode, grayscale, resize and ASCII conversion run in worker processes so they never
+    # hold the GIL the Tk main loop needs. Only paths and strings cross the process
+    # boundary, and requests arriving within IMAGE_BATCH_WINDOW travel as one batch.
+    # With max_workers=0 (or if processes cannot start) the work runs in the calling thread.
+    def __init__(self, max_workers=None, batch_window=IMAGE_BATCH_WINDOW, max_batch=IMAGE_BATCH_MAX):
+        if max_workers is None:
+            max_workers = min(2, (os.cpu_count() or 1) - 1)  # on one core a worker only competes with Tk
+        self.max_workers = max_workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.executor = None
+        self.lock = threading.Lock()
+        self.pending = []
+        self.timer = None
+
+    def ascii_art(self, path, width, charset, dither):
+        future = lazy_import("concurrent.futures").Future()
+        if self.max_workers <= 0:
+            self.finish([((path, width, charset, dither), future)], ascii_art_batch([(path, width, charset, dither)]))
+            return future
+        batch = None
+        with self.lock:
+            self.pending.append(((path, width, charset, dither), future))
+            if len(self.pending) >= self.max_batch:
+                batch = self.take_pending()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.batch_window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if batch:
+            self.dispatch(batch)
+        return future
+
+    def decoded_image(self, path):
+        # Not batched: CRT mode shows one image at a time.
+        future = lazy_import("concurrent.futures").Future()
+        self.dispatch([(path, future)], decode_batch)
+        return future
+
+    def take_pending(self):
+        batch, self.pending = self.pending, []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return batch
+
+    def flush(self):
+        with self.lock:
+            batch = self.take_pending()
+        if batch:
+            self.dispatch(batch)
+
+    def dispatch(self, batch, work=ascii_art_batch):
+        if self.max_workers <= 0:
+            # No worker processes, or the pool failed after this batch was queued.
+            self.finish(batch, work([request for request, future in batch]))
+            return
+        # One chunk per worker: batching saves round trips without serializing the images.
+        size = -(-len(batch) // self.max_workers)
+        for chunk in (batch[i:i + size] for i in range(0, len(batch), size)):
+            requests = [request for request, future in chunk]
+            try:
+                with self.lock:
+                    if self.executor is None:
+                        self.executor = lazy_import("concurrent.futures").ProcessPoolExecutor(max_workers=self.max_workers)
+                    result = self.executor.submit(work, requests)
+            except Exception:
+                self.max_workers = 0  # no worker processes here; fall back to threads for good
+                self.finish(chunk, work(requests))
+                continue
+            result.add_done_callback(lambda done, chunk=chunk: self.finish_remote(chunk, done, work))
+
+    def finish_remote(self, batch, done, work):
+        if done.cancelled():
+            return  # shut down with the app
+        if done.exception() is not None:
+            # The pool itself failed (a crashed or unspawnable worker), not the image.
+            self.max_workers = 0
+            self.finish(batch, work([request for request, future in batch]))
+            return
+        self.finish(batch, done.result())
+
+    def finish(self, batch, results):
+        for (request, future), (ok, value) in zip(batch, results):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(Exception(value))
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+def is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("APITimeoutError", "APIConnectionError", "Timeout", "ReadTimeout",
+                                    "ConnectTimeout", "ConnectionError")
+
+
+class ScheduledJob:
+    def __init__(self, key, fn, model=None, on_cancel=None):
+        self.key = key
+        self.fn = fn
+        self.model = model
+        self.on_cancel = on_cancel
+        self.cancelled = threading.Event()
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.metrics = {}  # filled in by the job and the scheduler, read by Telemetry.finish
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise RequestCancelled()
+
+
+class RequestScheduler:
+    # Bounded worker pool shared by all tabs. Jobs with the same key (one per tab) run
+    # strictly one at a time in submission order; keys are served round-robin.
+    def __init__(self, max_workers=4, per_model_limit=2, max_retries=4, backoff_base=1.0, backoff_max=30.0):
+        self.max_workers = max_workers
+        self.per_model_limit = per_model_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cond = threading.Condition()
+        self.queues = OrderedDict()
+        self.running = {}
+        self.model_counts = {}
+        self.workers = []
+        self.stopped = False
+
+    def submit(self, key, fn, model=None, on_cancel=None):
+        job = ScheduledJob(key, fn, model, on_cancel)
+        with self.cond:
+            self.queues.setdefault(key, deque()).append(job)
+            if len(self.workers) < self.max_workers:
+                worker = threading.Thread(target=self.worker_loop, daemon=True)
+                self.workers.append(worker)
+                worker.start()
+            self.cond.notify()
+        return job
+
+    def next_job(self):
+        for key, queue in self.queues.items():
+            if key in self.running:
+                continue
+            job = queue[0]
+            if job.model is not None and self.model_counts.get(job.model, 0) >= self.per_model_limit:
+                continue
+            queue.popleft()
+            if queue:
+                self.queues.move_to_end(key)
+            else:
+                del self.queues[key]
+            return job
+        return None
+
+    def worker_loop(self):
+        while True:
+            with self.cond:
+                job = self.next_job()
+                while job is None and not self.stopped:
+                    self.cond.wait()
+                    job = self.next_job()
+                if self.stopped:
+                    return
+                self.running[job.key] = job
+                if job.model is not None:
+                    self.model_counts[job.model] = self.model_counts.get(job.model, 0) + 1
+            job.started_at = time.perf_counter()
+            try:
+                job.check()
+                job.fn(job)
+            except RequestCancelled:
+                self.notify_cancelled(job)
+            except Exception:
+                pass  # Jobs report their own errors to the UI.
+            finally:
+                with self.cond:
+                    del self.running[job.key]
+                    if job.model is not None:
+                        self.model_counts[job.model] -= 1
+                    self.cond.notify_all()
+
+    def notify_cancelled(self, job):
+        job.metrics["status"] = "cancelled"
+        if job.on_cancel is None:
+            return
+        try:
+            job.on_cancel(job)
+        except Exception:
+            pass  # The tab (or the whole window) may already be gone.
+
+    def call(self, job, request):
+        # Runs one network call for a job, retrying 429/5xx/connection errors with jittered backoff.
+        attempt = 0
+        while True:
+            job.check()
+            start = time.perf_counter()
+            try:
+                response = request()
+                self.add_network_time(job, start)
+                return response
+            except Exception as e:
+                self.add_network_time(job, start)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                job.metrics["retries"] = attempt + 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                retry_after = getattr(getattr(e, "response", None), "headers", {}).get("retry-after")
+                try:
+                    delay = max(delay, float(retry_after))
+                except (TypeError, ValueError):
+                    delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                if job.cancelled.wait(delay):
+                    raise RequestCancelled()
+
+    def add_network_time(self, job, start):
+        job.metrics["network"] = job.metrics.get("network", 0.0) + time.perf_counter() - start
+
+    def cancel(self, key):
+        with self.cond:
+            queued = self.queues.pop(key, deque())
+            running = self.running.get(key)
+        for job in queued:
+            job.cancelled.set()
+            self.notify_cancelled(job)
+        if running is not None:
+            running.cancelled.set()
+        return len(queued) + (running is not None)
+
+    def shutdown(self):
+        with self.cond:
+            self.stopped = True
+            keys = list(self.queues) + list(self.running)
+            self.cond.notify_all()
+        for key in keys:
+            self.cancel(key)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(len(ordered) * pct / 100 + 0.5) - 1))]
+
+
+class Telemetry:
+    # Per-request timings: a rolling window for the status bar and Performance window,
+    # plus a rotating JSONL log. Main-loop stalls come from the app's after() heartbeat.
+    METRICS = ("queue_wait", "network", "ttft", "tokens_per_sec", "render", "total", "ui_stall")
+
+    def __init__(self, path=TELEMETRY_FILE, log=True, window=TELEMETRY_WINDOW, max_bytes=1024 * 1024, backups=3):
+        self.path = path
+        self.log = log
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+        self.records = deque(maxlen=window)
+        self.stalls = deque(maxlen=window * 20)  # (perf_counter time, seconds late)
+        self.logger = None
+
+    def record_stall(self, now, late):
+        with self.lock:
+            self.stalls.append((now, late))
+
+    def max_stall_since(self, since):
+        with self.lock:
+            return max((late for t, late in self.stalls if t >= since), default=0.0)
+
+    def finish(self, job, render=0.0):
+        now = time.perf_counter()
+        metrics = job.metrics
+        record = {
+            "time": time.time(),
+            "kind": metrics.get("kind", "chat"),
+            "model": metrics.get("model", job.model),
+            "status": metrics.get("status", "ok"),
+            "queue_wait": (job.started_at or now) - job.submitted_at,
+            "network": metrics.get("network"),
+            "retries": metrics.get("retries", 0),
+            "prompt_tokens": metrics.get("prompt_tokens"),
+            "ttft": metrics.get("ttft"),
+            "tokens": metrics.get("tokens"),
+            "tokens_per_sec": metrics.get("tokens_per_sec"),
+            "render": metrics.get("render", 0.0) + render,
+            "total": now - job.submitted_at,
+            "ui_stall": self.max_stall_since(job.submitted_at),
+        }
+        with self.lock:
+            self.records.append(record)
+        if self.log:
+            try:
+                self.write(record)
+            except OSError:
+                self.log = False
+        return record
+
+    def write(self, record):
+        if self.logger is None:
+            logging = lazy_import("logging")
+            handler = lazy_import("logging.handlers").RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger = logging.getLogger("chatlpt.telemetry")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            self.logger.addHandler(handler)
+        self.logger.info(json.dumps(record))
+
+    def last(self):
+        with self.lock:
+            return self.records[-1] if self.records else None
+
+    def summary(self):
+        # {metric: (count, p50, p95, p99, max)} over the window, plus the raw heartbeat stalls.
+        with self.lock:
+            records = list(self.records)
+            stalls = [late for t, late in self.stalls]
+        summary = {}
+        for metric in self.METRICS:
+            values = [r[metric] for r in records if r.get(metric) is not None]
+            summary[metric] = (len(values), percentile(values, 50), percentile(values, 95),
+                               percentile(values, 99), max(values, default=None))
+        summary["heartbeat"] = (len(stalls), percentile(stalls, 50), percentile(stalls, 95),
+                                percentile(stalls, 99), max(stalls, default=None))
+        return summary
+
+    def reset(self):
+        with self.lock:
+            self.records.clear()
+            self.stalls.clear()
+
+
+class UiQueue:
+    # The one way worker threads reach Tk: updates are queued thread-safely and run by a
+    # single after() tick on the main thread. Text posted for the same key (one streamed
+    # reply) is merged into one call until that tick, updates for hidden tabs only get
+    # what is left of a small time budget, and the tick slows down when the queue is idle
+    # or draining it gets expensive, so typing keeps priority.
+    def __init__(self, root, visible=lambda frame: True):
+        self.root = root
+        self.visible = visible
+        self.items = deque()  # (frame or None, callable)
+        self.texts = {}  # key -> text pieces waiting for their queued item
+        self.interval = UI_TICK_IDLE_MS
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.root.after(self.interval, self.drain)
+
+    def post(self, fn, frame=None):
+        with self.lock:
+            self.items.append((frame, fn))
+
+    def post_text(self, key, text, apply, frame=None):
+        with self.lock:
+            pending = self.texts.get(key)
+            if pending is not None:
+                pending.append(text)
+                return
+            self.texts[key] = [text]
+            self.items.append((frame, lambda: apply(self.take_text(key))))
+
+    def take_text(self, key):
+        with self.lock:
+            return "".join(self.texts.pop(key, ()))
+
+    def depth(self):
+        with self.lock:
+            return len(self.items)
+
+    def drain(self):
+        start = time.perf_counter()
+        with self.lock:
+            items = self.items
+            self.items = deque()
+            self.peak = max(self.peak, len(items))
+        hidden = deque()
+        shown = {}
+        for frame, fn in items:
+            if frame is not None:
+                if frame not in shown:
+                    shown[frame] = self.visible(frame)
+                if not shown[frame]:
+                    hidden.append((frame, fn))
+                    continue
+            self.run(fn)
+        hidden_start = time.perf_counter()
+        while hidden:  # at least one per tick, so hidden tabs are never starved
+            self.run(hidden.popleft()[1])
+            if time.perf_counter() - hidden_start > UI_HIDDEN_BUDGET:
+                break
+        if hidden:
+            with self.lock:
+                self.items.extendleft(reversed(hidden))  # still ahead of anything newer for those tabs
+        elapsed = time.perf_counter() - start
+        if items:
+            self.interval = max(UI_TICK_MIN_MS, min(UI_TICK_MAX_MS, int(elapsed * 3000)))
+        else:
+            self.interval = min(self.interval * 2, UI_TICK_IDLE_MS)
+        self.root.after(self.interval, self.drain)
+
+    def run(self, fn):
+        try:
+            fn()
+        except Exception:
+            self.root.report_callback_exception(*sys.exc_info())
+
+
+def render_ascii_art(img, width=80, charset=ASCII_CHARSETS["standard"], dither=False):
+    key = (image_digest(img), width, charset, dither)
+    cached = ascii_art_cache.get(key)
+    if cached is not None:
+        return cached
+    Image = lazy_import("PIL.Image")
+    gray = img.convert("L")
+    height = max(1, int(gray.height / gray.width * width * 0.55))
+    gray = gray.resize((width, height))
+    levels = len(charset)
+    if dither:
+        # Quantize to one palette entry per character with Floyd-Steinberg error diffusion,
+        # so palette index k is the character index directly.
+        palette = []
+        for k in range(levels):
+            value = min(255, int((k + 0.5) * 256 / levels))
+            palette.extend((value, value, value))
+        palette.extend(palette[:3] * (256 - levels))
+        palette_img = Image.new("P", (1, 1))
+        palette_img.putpalette(palette)
+        indices = gray.convert("RGB").quantize(palette=palette_img, dither=Image.Dither.FLOYDSTEINBERG).tobytes()
+        table = [charset[i] if i < levels else charset[0] for i in range(256)]
+    else:
+        indices = gray.tobytes()
+        table = [charset[p * levels // 256] for p in range(256)]
+    # One C-level pass over the whole pixel buffer instead of a Python loop per pixel.
+    chars = indices.decode("latin-1").translate(table)
+    rows = [chars[i:i + width] for i in range(0, len(chars), width)]
+    ascii_art = "\n".join(rows) + "\n"
+    ascii_art_cache.put(key, ascii_art)
+    return ascii_art
+
+
+class CRTRenderer:
+    # Phosphor palette, scanlines, bloom, barrel curvature and vignette, done entirely with
+    # whole-image PIL operations. Per-size assets (scanline and vignette masks, distortion
+    # mesh) and per-image stages are cached separately, so a new image at the same window
+    # size or the same image at a new size only recomputes the stages that depend on it.
+    def __init__(self, max_items=24):
+        self.cache = LRUCache(max_items=max_items)
+
+    def cached(self, key, compute):
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            self.cache.put(key, value)
+        return value
+
+    def render(self, img, size):
+        digest = image_digest(img)
+        return self.cached(("frame", digest, size), lambda: self.compose(img, digest, size))
+
+    def compose(self, img, digest, size):
+        Image = lazy_import("PIL.Image")
+        ImageChops = lazy_import("PIL.ImageChops")
+        base = self.cached(("base", digest, size), lambda: self.phosphor(img, size))
+        glow = self.cached(("glow", digest, size), lambda: self.bloom(base))
+        frame = ImageChops.screen(ImageChops.multiply(base, self.scanlines(size)), glow)
+        frame = frame.transform(size, Image.MESH, self.mesh(size), Image.BILINEAR)
+        return ImageChops.multiply(frame, self.vignette(size))
+
+    def phosphor(self, img, size):
+        Image = lazy_import("PIL.Image")
+        ImageOps = lazy_import("PIL.ImageOps")
+        gray = ImageOps.contain(img.convert("L"), size)
+        screen = Image.new("L", size)
+        screen.paste(gray, ((size[0] - gray.width) // 2, (size[1] - gray.height) // 2))
+        dark, mid, bright = CRT_PHOSPHOR
+        return ImageOps.colorize(screen, black=dark, white=bright, mid=mid)
+
+    def bloom(self, base):
+        ImageFilter = lazy_import("PIL.ImageFilter")
+        bright = base.point([v if v >= CRT_BLOOM_THRESHOLD else 0 for v in range(256)] * 3)
+        return bright.filter(ImageFilter.GaussianBlur(CRT_BLOOM_RADIUS))
+
+    def scanlines(self, size):
+        def compute():
+            Image = lazy_import("PIL.Image")
+            dark = int(255 * CRT_SCANLINE)
+            column = Image.frombytes("L", (1, size[1]), bytes(255 if y % 2 == 0 else dark for y in range(size[1])))
+            mask = column.resize(size, Image.NEAREST)
+            return Image.merge("RGB", (mask, mask, mask))
+        return self.cached(("scanlines", size), compute)
+
+    def vignette(self, size):
+        def compute():
+            Image = lazy_import("PIL.Image")
+            # radial_gradient is 0 at the centre and 255 at the edge of a 256x256 image.
+            falloff = Image.radial_gradient("L").point([255 - min(255, max(0, v - 150) * 2) for v in range(256)])
+            mask = falloff.resize(size, Image.BILINEAR)
+            return Image.merge("RGB", (mask, mask, mask))
+        return self.cached(("vignette", size), compute)
+
+    def mesh(self, size):
+        def compute():
+            width, height = size
+
+            def source(x, y):
+                # Barrel distortion: points further from the centre sample further out.
+                u, v = 2 * x / width - 1, 2 * y / height - 1
+                scale = 1 + CRT_CURVATURE * (u * u + v * v)
+                return (u * scale + 1) * width / 2, (v * scale + 1) * height / 2
+
+            xs = [round(width * i / CRT_MESH_CELLS) for i in range(CRT_MESH_CELLS + 1)]
+            ys = [round(height * j / CRT_MESH_CELLS) for j in range(CRT_MESH_CELLS + 1)]
+            mesh = []
+            for x0, x1 in zip(xs, xs[1:]):
+                for y0, y1 in zip(ys, ys[1:]):
+                    quad = source(x0, y0) + source(x0, y1) + source(x1, y1) + source(x1, y0)
+                    mesh.append(((x0, y0, x1, y1), quad))
+            return mesh
+        return self.cached(("mesh", size), compute)
+
 
 class ChatGPTTerminal:
-    def __init__(self, root):
+    def __init__(self, root, profiler=None):
         self.root = root
+        self.profiler = profiler or StartupProfiler()
 
         # Default settings
         self.api_key = None
@@ -25,24 +1817,120 @@ class ChatGPTTerminal:
         self.default_font_size = 12  # windowed mode
         self.fullscreen = False
         self.image_display_mode = "inline"  # "inline" for ASCII, "crt" for CRT popup
+        self.stream_responses = True
+        self.ascii_width = 80
+        self.ascii_charset = "standard"
+        self.ascii_dither = False
+        self.api_base_url = None  # e.g. a local fake endpoint for testing
+        self.request_timeout = 60
+        self.max_concurrent_requests = 4
+        self.per_model_concurrency = 2
+        self.max_retries = 4
+        self.context_policy = "sliding"
+        self.context_keep_last = 20
+        self.context_reserve_tokens = 1024  # left free for the reply
+        self.cache_responses = False
+        self.cache_max_mb = 32
+        self.cache_ttl_hours = 168
+        self.image_model = "dall-e-2"
+        self.lazy_render_messages = 200  # messages shown up front when opening a chat
+        self.preload_modules = True
+        self.show_status_bar = False
+        self.telemetry_log = True
+        self.search_watch_dirs = []
+        self.hibernate_idle_minutes = 30  # 0 disables
+        self.hibernate_budget_mb = 256  # 0 disables
+        self.hibernate_dir = None  # per-session temp dir, created on first use
+        self.autosave_lock = None  # held while this instance has autosaves, so others leave them alone
+        self.image_worker_processes = None  # None picks from the core count; 0 converts in the request thread
+        self.http_max_connections = 8
+        self.http_keepalive_seconds = 60
+        self.http_connect_timeout = 5
+        self.warm_connections = True  # open the API connection at startup and when coming back from idle
+        self.model_catalog_ttl_hours = 24
+        self.request_counter = 0
 
         # Load persistent config if available.
         self.load_config()
+        self.profiler.mark("load config")
 
-        # Instantiate OpenAI client if API key is available.
+        # The OpenAI client is created on first use, or by the idle-time preloader.
         self.client = None
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
+        self.client_lock = threading.Lock()
+        self.http = HttpPool(max_connections=self.http_max_connections, keepalive=self.http_keepalive_seconds,
+                             connect_timeout=self.http_connect_timeout, read_timeout=self.request_timeout)
+
+        self.scheduler = RequestScheduler(max_workers=self.max_concurrent_requests,
+                                          per_model_limit=self.per_model_concurrency,
+                                          max_retries=self.max_retries)
+        self.response_cache = ResponseCache(max_bytes=self.cache_max_mb * 1024 * 1024,
+                                            ttl=self.cache_ttl_hours * 3600)
+        self.image_pipeline = ImagePipeline(self.http)
+        self.model_catalog = ModelCatalog(ttl=self.model_catalog_ttl_hours * 3600)
+        self.model_listbox = None
+        self.image_workers = ImageWorkerPool(max_workers=self.image_worker_processes)
+        self.ascii_inflight = {}  # conversions already queued, so history batches are not converted twice
+        self.ascii_lock = threading.RLock()
+        self.crt_renderer = CRTRenderer()
+        self.crt_window = None
+        self.crt_image = None
+        self.crt_size = None
+        self.crt_resize_job = None
+        self.crt_generation = 0
+        self.journal_writer = JournalWriter()
+        self.ui = UiQueue(root, visible=self.is_visible_tab)
+        self.ui.start()
+        self.telemetry = Telemetry(log=self.telemetry_log)
+        self.search_index = SearchIndex(watch_dirs=self.search_watch_dirs)
+        self.profiler.mark("services")
 
         self.style = ttk.Style()
         self.default_tab_layout = self.style.layout("TNotebook.Tab")
 
         self.setup_menu()
+        self.profiler.mark("menu")
         self.setup_tabs()
+        self.profiler.mark("first tab")
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # Everything not needed to draw the first prompt waits until the window is idle.
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        first_prompt = self.profiler.mark("first prompt drawn")
         self.setup_bindings()
         self.setup_tab_context_menu()
+        self.heartbeat(time.perf_counter() + HEARTBEAT_MS / 1000)
+        if not self.profiler.enabled:
+            self.search_index.start()
+            self.root.after(HIBERNATE_CHECK_MS, self.check_hibernation)
+        if self.preload_modules or self.profiler.enabled:
+            threading.Thread(target=self.preload, args=(first_prompt,), daemon=True).start()
+        if not self.profiler.enabled:
+            self.refresh_models()
+            self.offer_autosave_recovery()
 
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+    def heartbeat(self, due):
+        now = time.perf_counter()
+        self.telemetry.record_stall(now, max(0.0, now - due))
+        self.root.after(HEARTBEAT_MS, self.heartbeat, now + HEARTBEAT_MS / 1000)
+
+    def preload(self, first_prompt):
+        for name in PRELOAD_MODULES:
+            try:
+                self.profiler.timed(f"idle preload: {name}", lambda: lazy_import(name))
+            except ImportError:
+                pass
+        if self.api_key:
+            try:
+                self.profiler.timed("idle preload: OpenAI client", self.ensure_client)
+            except Exception:
+                pass  # Reported on first use instead.
+            if self.warm_connections and not self.profiler.enabled:
+                self.http.warm(self.api_base_url)
+        if self.profiler.enabled:
+            print(self.profiler.report(first_prompt), flush=True)
+            self.ui.post(self.on_closing)
 
     def load_config(self):
         if os.path.exists(CONFIG_FILE):
@@ -55,6 +1943,35 @@ class ChatGPTTerminal:
                 self.custom_font_size = config.get("custom_font_size", 16)
                 self.use_default_scaling = config.get("use_default_scaling", True)
                 self.image_display_mode = config.get("image_display_mode", "inline")
+                self.stream_responses = config.get("stream_responses", True)
+                self.ascii_width = config.get("ascii_width", 80)
+                self.ascii_charset = config.get("ascii_charset", "standard")
+                self.ascii_dither = config.get("ascii_dither", False)
+                self.api_base_url = config.get("api_base_url", None)
+                self.request_timeout = config.get("request_timeout", 60)
+                self.max_concurrent_requests = config.get("max_concurrent_requests", 4)
+                self.per_model_concurrency = config.get("per_model_concurrency", 2)
+                self.max_retries = config.get("max_retries", 4)
+                self.context_policy = config.get("context_policy", "sliding")
+                self.context_keep_last = config.get("context_keep_last", 20)
+                self.context_reserve_tokens = config.get("context_reserve_tokens", 1024)
+                self.cache_responses = config.get("cache_responses", False)
+                self.cache_max_mb = config.get("cache_max_mb", 32)
+                self.cache_ttl_hours = config.get("cache_ttl_hours", 168)
+                self.image_model = config.get("image_model", "dall-e-2")
+                self.lazy_render_messages = config.get("lazy_render_messages", 200)
+                self.preload_modules = config.get("preload_modules", True)
+                self.show_status_bar = config.get("show_status_bar", False)
+                self.telemetry_log = config.get("telemetry_log", True)
+                self.search_watch_dirs = config.get("search_watch_dirs", [])
+                self.hibernate_idle_minutes = config.get("hibernate_idle_minutes", 30)
+                self.hibernate_budget_mb = config.get("hibernate_budget_mb", 256)
+                self.image_worker_processes = config.get("image_worker_processes", None)
+                self.http_max_connections = config.get("http_max_connections", 8)
+                self.http_keepalive_seconds = config.get("http_keepalive_seconds", 60)
+                self.http_connect_timeout = config.get("http_connect_timeout", 5)
+                self.warm_connections = config.get("warm_connections", True)
+                self.model_catalog_ttl_hours = config.get("model_catalog_ttl_hours", 24)
             except Exception as e:
                 messagebox.showerror("Config Error", f"Failed to load config: {e}")
 
@@ -65,7 +1982,36 @@ class ChatGPTTerminal:
             "font_family": self.font_family,
             "custom_font_size": self.custom_font_size,
             "use_default_scaling": self.use_default_scaling,
-            "image_display_mode": self.image_display_mode
+            "image_display_mode": self.image_display_mode,
+            "stream_responses": self.stream_responses,
+            "ascii_width": self.ascii_width,
+            "ascii_charset": self.ascii_charset,
+            "ascii_dither": self.ascii_dither,
+            "api_base_url": self.api_base_url,
+            "request_timeout": self.request_timeout,
+            "max_concurrent_requests": self.max_concurrent_requests,
+            "per_model_concurrency": self.per_model_concurrency,
+            "max_retries": self.max_retries,
+            "context_policy": self.context_policy,
+            "context_keep_last": self.context_keep_last,
+            "context_reserve_tokens": self.context_reserve_tokens,
+            "cache_responses": self.cache_responses,
+            "cache_max_mb": self.cache_max_mb,
+            "cache_ttl_hours": self.cache_ttl_hours,
+            "image_model": self.image_model,
+            "lazy_render_messages": self.lazy_render_messages,
+            "preload_modules": self.preload_modules,
+            "show_status_bar": self.show_status_bar,
+            "telemetry_log": self.telemetry_log,
+            "search_watch_dirs": self.search_index.watch_dirs,
+            "hibernate_idle_minutes": self.hibernate_idle_minutes,
+            "hibernate_budget_mb": self.hibernate_budget_mb,
+            "image_worker_processes": self.image_worker_processes,
+            "http_max_connections": self.http_max_connections,
+            "http_keepalive_seconds": self.http_keepalive_seconds,
+            "http_connect_timeout": self.http_connect_timeout,
+            "warm_connections": self.warm_connections,
+            "model_catalog_ttl_hours": self.model_catalog_ttl_hours
         }
         try:
             with open(CONFIG_FILE, "w", encoding="utf-8") as f:
@@ -73,9 +2019,92 @@ class ChatGPTTerminal:
         except Exception as e:
             messagebox.showerror("Config Error", f"Failed to save config: {e}")
 
-    def on_closing(self):
-        self.save_config()
-        self.root.destroy()
+    def on_closing(self):
+        self.save_config()
+        self.scheduler.shutdown()
+        self.search_index.stop()
+        self.image_workers.shutdown()
+        self.http.close()
+        for tab_id in self.notebook.tabs():
+            journal = self.notebook.nametowidget(tab_id).journal
+            if journal is not None:
+                journal.close()
+        if self.hibernate_dir is not None:
+            self.journal_writer.submit(lambda: lazy_import("shutil").rmtree(self.hibernate_dir, ignore_errors=True))
+        self.journal_writer.flush()
+        if self.autosave_lock is not None:
+            self.autosave_lock.close()
+            try:
+                os.remove(autosave_lock_path(os.getpid()))
+            except OSError:
+                pass
+        self.root.destroy()
+
+    def autosave_path(self):
+        if self.autosave_lock is None:
+            os.makedirs(AUTOSAVE_DIR, exist_ok=True)
+            try:
+                self.autosave_lock = lock_file(autosave_lock_path(os.getpid()))
+            except OSError:
+                pass  # Without the lock another instance may offer these files for recovery.
+        self.request_counter += 1
+        return os.path.join(AUTOSAVE_DIR,
+                            f"chat-{time.strftime('%Y%m%d-%H%M%S')}-{self.request_counter}-pid{os.getpid()}.lpt")
+
+    def attach_journal(self, frame, journal):
+        frame.journal = journal
+        frame.messages.journal = journal
+
+    def offer_autosave_recovery(self):
+        if not os.path.isdir(AUTOSAVE_DIR):
+            return
+        # Autosaves are named chat-<time>-<n>-pid<owner>.lpt; those of an instance still
+        # holding its lock are in use and are neither offered nor deleted.
+        me = str(os.getpid())
+        live = {}
+        paths = []
+        for name in sorted(os.listdir(AUTOSAVE_DIR)):
+            if not name.endswith(".lpt"):
+                continue
+            owner = name[:-4].rpartition("-pid")[2]
+            if owner not in live:
+                live[owner] = False
+                if owner != me and os.path.exists(autosave_lock_path(owner)):
+                    try:
+                        lock_file(autosave_lock_path(owner)).close()
+                        os.remove(autosave_lock_path(owner))  # left behind by a crash
+                    except OSError:
+                        live[owner] = True
+            if not live[owner]:
+                paths.append(os.path.join(AUTOSAVE_DIR, name))
+        if not paths:
+            return
+        if messagebox.askyesno("Restore Chats", f"Restore {len(paths)} unsaved chat(s) from the last session?"):
+            for path in paths:
+                # Taken over under this instance's name first, so another one starting now skips it.
+                adopted = self.autosave_path()
+                try:
+                    os.replace(path, adopted)
+                except OSError:
+                    continue  # another instance recovered or discarded it first
+                self.open_chat(adopted, autosave=True)
+        else:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def make_client(self):
+        return self.http.api_client(self.api_key, self.api_base_url)
+
+    def ensure_client(self):
+        if not self.api_key:
+            raise Exception("API key not provided. Please set your API key in Settings.")
+        with self.client_lock:
+            if not self.client or self.client.api_key != self.api_key:
+                self.client = self.make_client()
+            return self.client
 
     def setup_menu(self):
         self.menu_bar = tk.Menu(self.root)
@@ -85,7 +2114,7 @@ class ChatGPTTerminal:
         file_menu.add_command(label="Open Chat", command=self.open_chat)
         file_menu.add_command(label="Settings", command=self.open_settings)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self.on_closing)
         self.menu_bar.add_cascade(label="File", menu=file_menu)
 
         models_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -94,6 +2123,10 @@ class ChatGPTTerminal:
 
         tools_menu = tk.Menu(self.menu_bar, tearoff=0)
         tools_menu.add_command(label="Clear Session", command=self.clear_session, accelerator="F3")
+        tools_menu.add_command(label="Search Chats...", command=self.show_search, accelerator="Ctrl+Shift+F")
+        tools_menu.add_command(label="Response Cache...", command=self.show_cache_stats)
+        tools_menu.add_command(label="Performance...", command=self.show_performance)
+        tools_menu.add_command(label="Tab Memory...", command=self.show_tab_memory)
         self.menu_bar.add_cascade(label="Tools", menu=tools_menu)
 
         about_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -105,11 +2138,200 @@ class ChatGPTTerminal:
     def setup_tabs(self):
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.selected_tab = None
+        self.status_bar = tk.Label(self.root, text="No requests yet.", anchor="w", bg="black", fg="lime",
+                                   font=("Courier", 9))
+        if self.show_status_bar:
+            self.status_bar.pack(side="bottom", fill="x", before=self.notebook)
         self.create_new_tab()
 
     def setup_tab_context_menu(self):
         self.notebook.bind("<Button-3>", self.on_tab_right_click)
 
+    def on_tab_changed(self, event=None):
+        now = time.monotonic()
+        if self.selected_tab is not None and self.selected_tab.winfo_exists():
+            self.selected_tab.last_active = now
+        try:
+            self.selected_tab = self.notebook.nametowidget(self.notebook.select())
+        except (tk.TclError, KeyError):
+            self.selected_tab = None
+            return
+        self.selected_tab.last_active = now
+        self.wake_tab(self.selected_tab)
+
+    def tab_memory(self, frame):
+        # Rough bytes held by a tab: its Text buffer (with undo) and its message list.
+        if frame.hibernated is not None:
+            return 0, 0
+        chars = (frame.text_area.count("1.0", "end", "chars") or (0,))[0]
+        counted, message_bytes = frame.memory_count
+        if counted > len(frame.messages):
+            counted, message_bytes = 0, 0  # the session was cleared
+        message_bytes += sum(len(msg.get("content") or "") + MESSAGE_OVERHEAD_BYTES for msg in frame.messages[counted:])
+        frame.memory_count = (len(frame.messages), message_bytes)
+        return chars * TEXT_BYTES_PER_CHAR, message_bytes
+
+    def can_hibernate(self, frame):
+        return (frame.hibernated is None and not frame.pending and frame.history_ready.is_set()
+                and str(frame) != self.notebook.select())
+
+    def check_hibernation(self):
+        now = time.monotonic()
+        tabs = [self.notebook.nametowidget(tab_id) for tab_id in self.notebook.tabs()]
+        candidates = sorted((f for f in tabs if self.can_hibernate(f)), key=lambda f: f.last_active)
+        if self.hibernate_idle_minutes > 0:
+            for frame in candidates:
+                if now - frame.last_active > self.hibernate_idle_minutes * 60:
+                    self.hibernate_tab(frame)
+        if self.hibernate_budget_mb > 0:
+            total = sum(sum(self.tab_memory(f)) for f in tabs)
+            for frame in candidates:
+                if total <= self.hibernate_budget_mb * 1024 * 1024:
+                    break
+                size = sum(self.tab_memory(frame))
+                if self.hibernate_tab(frame):
+                    total -= size
+        self.root.after(HIBERNATE_CHECK_MS, self.check_hibernation)
+
+    def hibernate_tab(self, frame):
+        # Spills the transcript and messages to disk and empties the Text widget and its undo stack.
+        if not self.can_hibernate(frame):
+            return False
+        if self.hibernate_dir is None:
+            self.hibernate_dir = lazy_import("tempfile").mkdtemp(prefix="chatlpt-hibernate-")
+        self.request_counter += 1
+        path = os.path.join(self.hibernate_dir, f"tab{self.request_counter}.json")
+        text_area = frame.text_area
+        state = {
+            "transcript": text_area.get("1.0", "end-1c"),
+            "cmd_start": text_area.index(frame.cmd_start),
+            "marker_end": text_area.index("history_marker.last") if text_area.tag_ranges("history_marker") else None,
+            "yview": text_area.yview()[0],
+            "messages": list(frame.messages),
+            "summary": frame.messages.summary,
+            "format_tags": {tag: [str(index) for index in text_area.tag_ranges(tag)] for tag in FORMAT_TAGS},
+            "formatted": {name: [text_area.index(name), text_area.index(f"{name}e"), source, width]
+                          for name, (source, width) in frame.formatted.items()},
+        }
+
+        def spill():
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+
+        # Written on the journal thread, so the UI never waits on a large dump.
+        self.journal_writer.submit(spill)
+        frame.hibernated = path
+        frame.messages = ChatHistory()
+        frame.memory_count = (0, 0)
+        self.forget_formatted(frame)
+        text_area.delete("1.0", "end")
+        text_area.insert("1.0", "[Hibernated to save memory - select this tab to restore]\n")
+        text_area.edit_reset()
+        if frame.journal is not None:
+            self.search_index.index(frame.journal.path)  # keeps the tab findable in search
+        return True
+
+    def wake_tab(self, frame):
+        path = frame.hibernated
+        if path is None:
+            return
+        frame.hibernated = None
+
+        def load():
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            os.remove(path)
+            return state
+
+        text_area = frame.text_area
+        try:
+            state = self.journal_writer.call(load)
+            messages = state["messages"]
+        except Exception:
+            # The journal has every message, even if the spill file is gone; a tab whose
+            # journal was never written had nothing but the system prompt.
+            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+            if frame.journal is not None and os.path.exists(frame.journal.path):
+                try:
+                    messages = read_lpt(frame.journal.path)[0]
+                except Exception:
+                    pass
+            state = {"transcript": self.history_text(messages, frame.wrap_width), "cmd_start": None,
+                     "marker_end": None, "yview": 1.0, "summary": None}
+            frame.rendered_from = 0
+        frame.messages = ChatHistory(messages)
+        frame.messages.summary = tuple(state["summary"]) if state["summary"] else None
+        frame.messages.journal = frame.journal
+        text_area.delete("1.0", "end")
+        if "formatted" in state:
+            text_area.insert("1.0", state["transcript"])
+            for tag, ranges in state["format_tags"].items():
+                if ranges:
+                    text_area.tag_add(tag, *ranges)
+            for name, (start, end, source, width) in state["formatted"].items():
+                self.mark_formatted(frame, name, start, end, source, width)
+        else:
+            self.insert_history(frame, state["transcript"])
+        if state["marker_end"]:
+            text_area.tag_add("history_marker", "1.0", state["marker_end"])
+        if state["cmd_start"]:
+            text_area.mark_set("cmd_start", state["cmd_start"])
+            text_area.mark_gravity("cmd_start", "left")
+            text_area.mark_set("insert", "end")
+        else:
+            self.insert_prompt(frame)
+        text_area.edit_reset()
+        text_area.yview_moveto(state["yview"])
+        frame.last_active = time.monotonic()
+
+    def discard_hibernation(self, frame):
+        path = frame.hibernated
+        if path is not None:
+            frame.hibernated = None
+            self.journal_writer.submit(lambda: os.remove(path))
+
+    def show_tab_memory(self):
+        win = tk.Toplevel(self.root)
+        win.title("Tab Memory")
+        budget = f"{self.hibernate_budget_mb} MB" if self.hibernate_budget_mb > 0 else "off"
+        idle = f"{self.hibernate_idle_minutes} min" if self.hibernate_idle_minutes > 0 else "off"
+        tk.Label(win, text=f"Tabs are hibernated after {idle} idle or above a {budget} budget (estimates).").pack(padx=10, pady=5)
+        stats_label = tk.Label(win, justify="left", font=("Courier", 10))
+        stats_label.pack(padx=10, pady=5)
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            now = time.monotonic()
+            lines = [f"{'Tab':<24}{'State':<16}{'Text':>10}{'Messages':>10}{'Total':>10}"]
+            total = 0
+            for tab_id in self.notebook.tabs():
+                frame = self.notebook.nametowidget(tab_id)
+                text_bytes, message_bytes = self.tab_memory(frame)
+                total += text_bytes + message_bytes
+                if frame.hibernated is not None:
+                    state = "hibernated"
+                elif str(frame) == self.notebook.select():
+                    state = "active"
+                else:
+                    state = f"idle {int((now - frame.last_active) / 60)} min"
+                lines.append(f"{self.notebook.tab(tab_id, 'text')[:23]:<24}{state:<16}"
+                             f"{text_bytes / 1024:>8.0f}KB{message_bytes / 1024:>8.0f}KB"
+                             f"{(text_bytes + message_bytes) / 1024:>8.0f}KB")
+            lines.append(f"\nAll tabs: {total / 1024 / 1024:.1f} MB")
+            stats_label.config(text="\n".join(lines))
+            win.after(2000, refresh)
+
+        def hibernate_inactive():
+            for tab_id in self.notebook.tabs():
+                self.hibernate_tab(self.notebook.nametowidget(tab_id))
+
+        tk.Button(win, text="Hibernate Inactive Tabs", command=hibernate_inactive).pack(side="left", padx=10, pady=10)
+        tk.Button(win, text="Close", command=win.destroy).pack(side="right", padx=10, pady=10)
+        refresh()
+
     def on_tab_right_click(self, event):
         try:
             index = self.notebook.index("@%d,%d" % (event.x, event.y))
@@ -137,12 +2359,29 @@ class ChatGPTTerminal:
         if answer:
             self.notebook.select(tab_frame)
             self.save_chat()
+        self.scheduler.cancel(tab_frame)
+        self.discard_hibernation(tab_frame)
         if len(self.notebook.tabs()) == 1:
-            self.root.destroy()
-        else:
-            self.notebook.forget(index)
+            if answer is False and tab_frame.journal is not None and tab_frame.journal.autosave:
+                tab_frame.journal.delete()
+            self.on_closing()
+            return
+        if tab_frame.journal is not None:
+            if answer is False and tab_frame.journal.autosave:
+                tab_frame.journal.delete()
+            else:
+                tab_frame.journal.close()
+        self.notebook.forget(index)
 
     def create_new_tab(self, title="Chat"):
+        frame = self.build_tab(title)
+        frame.messages = ChatHistory([{"role": "system", "content": SYSTEM_PROMPT}])
+        self.attach_journal(frame, ChatJournal(self.autosave_path(), self.journal_writer,
+                                               autosave=True, seed=frame.messages))
+        self.insert_prompt(frame)
+        return frame
+
+    def build_tab(self, title):
         frame = ttk.Frame(self.notebook)
         self.notebook.add(frame, text=title)
         text_area = tk.Text(frame, bg="black", fg="lime", insertbackground="lime",
@@ -154,23 +2393,45 @@ class ChatGPTTerminal:
         if cursor_width < 1:
             cursor_width = 1
         text_area.config(insertwidth=cursor_width, insertontime=600, insertofftime=400)
+        self.configure_format_tags(text_area, self.default_font_size)
         frame.text_area = text_area
         text_area.bind("<Alt-Return>", lambda e: self.toggle_fullscreen(e) or "break")
-        frame.messages = [{"role": "system", "content": "You are a helpful assistant."}]
-        self.insert_prompt(frame)
+        frame.pending = set()
+        frame.rendered_from = 0  # index of the oldest message shown in the Text widget
+        frame.journal = None
+        frame.history_ready = threading.Event()  # cleared while a journaled chat's full history loads
+        frame.history_ready.set()
+        frame.hibernated = None  # spill file path while the tab is hibernated
+        frame.last_active = time.monotonic()
+        frame.memory_count = (0, 0)  # (messages counted, their estimated bytes)
+        frame.wrap_width = WRAP_COLUMNS
+        frame.formatted = {}  # start mark -> (source text, width it is wrapped at)
+        frame.image_marks = set()  # start marks of image placeholders still waiting for their art
+        frame.stale_wraps = 0  # formatted messages wrapped at another width than wrap_width
+        frame.wrap_pending = None
+        frame.rewrap_pending = None
+        text_area.config(yscrollcommand=lambda *args, f=frame: self.on_text_scroll(f))
+        text_area.bind("<Configure>", lambda e, f=frame: self.schedule_wrap_update(f))
         text_area.bind("<Return>", lambda e, f=frame: self.on_return(e, f))
+        text_area.bind("<Escape>", lambda e, f=frame: self.cancel_requests(f))
         text_area.bind("<Key>", lambda e, f=frame: self.on_key_press(e, f))
         text_area.bind("<Up>", lambda e, tw=text_area: self.scroll_text(e, tw, -1, "units"))
         text_area.bind("<Down>", lambda e, tw=text_area: self.scroll_text(e, tw, 1, "units"))
         text_area.bind("<Prior>", lambda e, tw=text_area: self.scroll_text(e, tw, -1, "pages"))
         text_area.bind("<Next>", lambda e, tw=text_area: self.scroll_text(e, tw, 1, "pages"))
+        for sequence in ("<MouseWheel>", "<Button-4>"):
+            text_area.bind(sequence, lambda e, f=frame: f.text_area.after_idle(lambda: self.check_history_top(f)), add="+")
+        return frame
 
     def insert_prompt(self, frame):
         text_area = frame.text_area
         if not text_area.get("end-2c", "end-1c").endswith("\n"):
             text_area.insert("end", "\n")
         text_area.insert("end", "> ")
-        frame.cmd_start = text_area.index("end-1c")
+        # A mark (not a fixed index) so replies inserted above the prompt don't shift it.
+        text_area.mark_set("cmd_start", "end-1c")
+        text_area.mark_gravity("cmd_start", "left")
+        frame.cmd_start = "cmd_start"
         text_area.mark_set("insert", "end")
 
     def on_return(self, event, frame):
@@ -180,100 +2441,583 @@ class ChatGPTTerminal:
             return "break"
 
         text_area.insert("end", "\n")
-        frame.messages.append({"role": "user", "content": command})
 
         if command.startswith("/image "):
             prompt = command[len("/image "):].strip()
-            text_area.insert("end", "[Generating image...]\n")
-            text_area.see("end")
-            threading.Thread(target=self.process_image_command, args=(frame, prompt), daemon=True).start()
+            rid = self.insert_placeholder(frame, "[Generating image...]")
+            self.scheduler.submit(frame, lambda job: self.process_image_command(frame, prompt, rid, job, command),
+                                  model="image", on_cancel=lambda job: self.cancelled_response(frame, rid, job))
         else:
-            text_area.insert("end", "[Thinking...]\n")
-            text_area.see("end")
-            threading.Thread(target=self.process_gpt_response, args=(frame,), daemon=True).start()
+            rid = self.insert_placeholder(frame, "[Thinking...]")
+            self.scheduler.submit(frame, lambda job: self.process_gpt_response(frame, rid, job, command),
+                                  model=self.current_model, on_cancel=lambda job: self.cancelled_response(frame, rid, job))
+        self.insert_prompt(frame)
+        text_area.see("end")
+        return "break"
+
+    def insert_placeholder(self, frame, placeholder):
+        # Each in-flight request owns a tag over its placeholder text and a mark where
+        # its reply is written, so replies land in order without touching the rest of the buffer.
+        self.request_counter += 1
+        rid = f"reply{self.request_counter}"
+        text_area = frame.text_area
+        text_area.insert("end", placeholder, (rid,))
+        text_area.insert("end", "\n")
+        # Before the newline, so the prompt inserted next (and anything typed) stays after it.
+        text_area.mark_set(rid, "end-2c")
+        text_area.mark_gravity(rid, "right")
+        frame.pending.add(rid)
+        return rid
+
+    def set_placeholder(self, frame, rid, placeholder):
+        text_area = frame.text_area
+        if rid not in frame.pending or not text_area.tag_ranges(rid):
+            return
+        text_area.insert(f"{rid}.first", placeholder, (rid,))
+        text_area.delete(f"{rid}.first + {len(placeholder)}c", f"{rid}.last")
+
+    def insert_reply_text(self, frame, rid, text):
+        if rid not in frame.pending:
+            return  # The session was cleared while the request was in flight.
+        text_area = frame.text_area
+        if text_area.tag_ranges(rid):
+            text_area.delete(f"{rid}.first", f"{rid}.last")
+            text_area.tag_delete(rid)
+        start = text_area.index(rid)
+        self.insert_formatted(text_area, rid, text)
+        if text and getattr(text, "source", None) is not None:
+            self.mark_formatted(frame, self.format_mark_name(), start, rid, text.source, frame.wrap_width)
+
+    def insert_formatted(self, text_area, index, text):
+        # One insert with the tags attached, rather than an insert plus a tag_add per span.
+        spans = getattr(text, "spans", ())
+        if not spans:
+            text_area.insert(index, str(text))
+            return
+        args = []
+        pos = 0
+        for start, end, tag in spans:
+            if start > pos:
+                args += [text[pos:start], ()]
+            args += [text[start:end], (tag,)]
+            pos = end
+        if pos < len(text):
+            args.append(text[pos:])
+        text_area.insert(index, *args)
+
+    def format_mark_name(self):
+        self.request_counter += 1
+        return f"fmt{self.request_counter}"
+
+    def mark_formatted(self, frame, name, start, end, source, width):
+        # A start and end mark per formatted message, so a width change can re-wrap just
+        # the messages in view; the end mark stays put when the next reply is inserted.
+        text_area = frame.text_area
+        text_area.mark_set(name, start)
+        text_area.mark_gravity(name, "right")
+        text_area.mark_set(f"{name}e", end)
+        text_area.mark_gravity(f"{name}e", "left")
+        frame.formatted[name] = (source, width)
+        if width != frame.wrap_width:
+            frame.stale_wraps += 1
+
+    def forget_formatted(self, frame):
+        for name in list(frame.formatted) + list(frame.image_marks):
+            frame.text_area.mark_unset(name, f"{name}e")
+        frame.formatted = {}
+        frame.stale_wraps = 0
+        frame.image_marks = set()
+
+    def finish_reply(self, frame, rid):
+        if rid not in frame.pending:
+            return
+        frame.pending.discard(rid)
+        frame.last_active = time.monotonic()
+        text_area = frame.text_area
+        text_area.tag_delete(rid)
+        text_area.mark_unset(rid)
+        text_area.see("end")
+
+    def cancel_requests(self, frame):
+        self.scheduler.cancel(frame)
         return "break"
 
-    def process_gpt_response(self, frame):
+    def cancelled_response(self, frame, rid, job):
+        # Passing the job records the cancellation in telemetry, even if it never started.
+        self.ui.post(lambda: self.update_response(frame, "[Cancelled]", rid, job), frame)
+
+    def discard_user_message(self, history, command):
+        # A cancelled request leaves no half-finished turn in the history.
+        if history and history[-1] == {"role": "user", "content": command}:
+            history.pop()
+
+    def context_messages(self, frame, job, model):
+        budget = self.model_catalog.context_window(model, self.api_base_url) - self.context_reserve_tokens
+
+        def summarize(earlier, transcript):
+            client = self.ensure_client()
+            prompt = "Summarize this conversation in a few sentences, keeping facts the user may refer back to."
+            if earlier:
+                transcript = f"Earlier summary: {earlier}\n{transcript}"
+            response = self.scheduler.call(job, lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "system", "content": prompt}, {"role": "user", "content": transcript}],
+                temperature=0.3
+            ))
+            return response.choices[0].message.content.strip()
+
+        messages, prompt_tokens = frame.messages.build(budget, self.context_policy, self.context_keep_last, summarize)
+        job.metrics["prompt_tokens"] = prompt_tokens  # after trimming, as sent
+        return messages, prompt_tokens
+
+    def wait_for_history(self, frame, job):
+        while not frame.history_ready.wait(0.1):
+            job.check()
+
+    def process_gpt_response(self, frame, rid, job, command):
+        self.wait_for_history(frame, job)
+        history = frame.messages  # a cleared session gets a new list; this turn stays with the old one
+        history.append({"role": "user", "content": command})
+        model = job.model
+        job.metrics.update(kind="chat", model=model)
+        reply = {"stream_state": None, "parts": []}
         try:
-            response = self.client.chat.completions.create(
-                model=self.current_model,
-                messages=frame.messages,
-                temperature=0.8
-            )
-            response_text = response.choices[0].message.content.strip()
+            messages, prompt_tokens = self.context_messages(frame, job, model)
+            self.ui.post(lambda: self.set_placeholder(frame, rid, f"[Thinking... {prompt_tokens} prompt tokens]"), frame)
+
+            def request():
+                if self.stream_responses:
+                    try:
+                        response_text = self.stream_gpt_response(frame, rid, job, model, messages, reply)
+                        if response_text is not None:
+                            return response_text
+                    except RequestCancelled:
+                        raise
+                    except Exception:
+                        if reply["stream_state"] is not None:
+                            raise
+                        # Nothing was rendered yet, so fall back to the blocking call.
+                client = self.ensure_client()
+                response = self.scheduler.call(job, lambda: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=CHAT_TEMPERATURE
+                ))
+                job.check()
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    job.metrics["tokens"] = usage.completion_tokens
+                frame.last_reply_stats = {"model": model, "prompt_tokens": prompt_tokens,
+                                          "tokens": job.metrics.get("tokens")}
+                return response.choices[0].message.content.strip()
+
+            if self.cache_responses:
+                key = ResponseCache.make_key(kind="chat", model=model, messages=messages, temperature=CHAT_TEMPERATURE)
+                response_text = self.response_cache.get_or_compute(key, request, job)
+            else:
+                response_text = request()
+        except RequestCancelled:
+            if reply["stream_state"] is None:
+                self.discard_user_message(history, command)
+                raise
+            # Keep what was already streamed into the tab.
+            job.metrics["status"] = "cancelled"
+            self.queue_stream_text(frame, rid, reply["stream_state"], "\n[Cancelled]")
+            response_text = "".join(reply["parts"]).rstrip()
         except Exception as e:
+            job.metrics["status"] = "error"
             response_text = f"Error: {e}"
-        processed_text = self.preprocess_text(response_text)
-        frame.messages.append({"role": "assistant", "content": response_text})
-        frame.text_area.after(0, lambda: self.update_response(frame, processed_text))
+            if reply["stream_state"] is not None:
+                self.queue_stream_text(frame, rid, reply["stream_state"], f"\n{response_text}")
+                response_text = "".join(reply["parts"]).rstrip() + f"\n{response_text}"
+        history.append({"role": "assistant", "content": response_text})
+        if reply["stream_state"] is not None:
+            stream_state = reply["stream_state"]
+            self.ui.post(lambda: self.finish_stream(frame, rid, stream_state, job), frame)
+        else:
+            processed_text = self.preprocess_text(response_text, frame.wrap_width)
+            self.ui.post(lambda: self.update_response(frame, processed_text, rid, job), frame)
+
+    def stream_gpt_response(self, frame, rid, job, model, messages, reply):
+        # Returns None if the stream produced no content, so the caller can retry without streaming.
+        start = time.perf_counter()
+        client = self.ensure_client()
+        stream = self.scheduler.call(job, lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=CHAT_TEMPERATURE,
+            stream=True
+        ))
+        stream_opened = time.perf_counter()
+        stream_state = {"render": 0.0, "formatter": StreamFormatter(frame.wrap_width), "mark": None, "shown": 0}
+        parts = reply["parts"]
+        first_token = None
+        tokens = 0
+        usage = None
+        for chunk in stream:
+            if job.cancelled.is_set():
+                stream.close()
+                raise RequestCancelled()
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+                delta = delta.lstrip()
+                reply["stream_state"] = stream_state
+            tokens += 1
+            parts.append(delta)
+            self.queue_stream_text(frame, rid, stream_state, delta)
+        if first_token is None:
+            return None
+        end = time.perf_counter()
+        if usage is not None and getattr(usage, "completion_tokens", None):
+            tokens = usage.completion_tokens
+        generation_time = end - first_token
+        frame.last_reply_stats = {
+            "model": model,
+            "prompt_tokens": job.metrics.get("prompt_tokens"),
+            "time_to_first_token": first_token - start,
+            "total_time": end - start,
+            "tokens": tokens,
+            "tokens_per_sec": tokens / generation_time if generation_time > 0 else 0.0
+        }
+        # scheduler.call only timed opening the stream; reading it is network time too.
+        self.scheduler.add_network_time(job, stream_opened)
+        job.metrics.update(ttft=first_token - start, tokens=tokens,
+                           tokens_per_sec=frame.last_reply_stats["tokens_per_sec"])
+        return "".join(parts).rstrip()
 
-    def process_image_command(self, frame, prompt):
+    def queue_stream_text(self, frame, rid, stream_state, text):
+        # Tokens arriving between two UI ticks become one Text insert.
+        self.ui.post_text(rid, text, lambda merged: self.flush_stream(frame, rid, stream_state, merged), frame)
+
+    def flush_stream(self, frame, rid, stream_state, text):
+        if not text:
+            return
+        start = time.perf_counter()
+        done, partial = stream_state["formatter"].feed(text)
+        self.insert_stream_text(frame, rid, stream_state, done, partial)
+        frame.text_area.see("end")
+        stream_state["render"] += time.perf_counter() - start
+
+    def insert_stream_text(self, frame, rid, stream_state, done, partial):
+        # Completed lines go in formatted; the raw partial line shown by the last flush is
+        # replaced each time, so no line is formatted more than once.
+        if rid not in frame.pending:
+            return
+        text_area = frame.text_area
+        if stream_state["mark"] is None:
+            if text_area.tag_ranges(rid):
+                text_area.delete(f"{rid}.first", f"{rid}.last")
+                text_area.tag_delete(rid)
+            stream_state["mark"] = self.format_mark_name()
+            text_area.mark_set(stream_state["mark"], rid)
+            text_area.mark_gravity(stream_state["mark"], "left")
+        elif stream_state["shown"]:
+            text_area.delete(f"{rid} - {stream_state['shown']} chars", rid)
+        if done:
+            self.insert_formatted(text_area, rid, done)
+        if partial:
+            text_area.insert(rid, partial)
+        stream_state["shown"] = len(partial)
+
+    def finish_stream(self, frame, rid, stream_state, job=None):
+        # Queued after the stream's last text, so everything streamed is already shown.
+        name = stream_state["mark"]
+        if name is not None:
+            start = time.perf_counter()
+            formatter = stream_state["formatter"]
+            self.insert_stream_text(frame, rid, stream_state, formatter.finish(), "")
+            if rid in frame.pending:
+                self.mark_formatted(frame, name, name, rid, "".join(formatter.source), formatter.width)
+            else:
+                frame.text_area.mark_unset(name)
+            stream_state["render"] += time.perf_counter() - start
+        self.finish_reply(frame, rid)
+        if job is not None:
+            self.finish_request(job, stream_state["render"])
+
+    def process_image_command(self, frame, prompt, rid, job, command):
+        self.wait_for_history(frame, job)
+        history = frame.messages
+        history.append({"role": "user", "content": command})
+        job.metrics.update(kind="image", model=self.image_model)
         try:
-            if not self.api_key:
-                raise Exception("API key not provided. Please set your API key in Settings.")
-            # Ensure the client is set up.
-            if not self.client:
-                self.client = OpenAI(api_key=self.api_key)
-            response = self.client.Image.create(
-                prompt=prompt,
-                n=1,
-                size="512x512",
-                model="image-alpha-001"
-            )
-            image_url = response['data'][0]['url']
-            r = requests.get(image_url)
-            img = Image.open(BytesIO(r.content))
+            params = {"model": self.image_model, "prompt": prompt, "size": "512x512"}
+            if self.cache_responses:
+                key = ResponseCache.make_key(kind="image", **params)
+                image_key = self.response_cache.get_or_compute(key, lambda: self.generate_image(job, params), job)
+                if not self.image_pipeline.has(image_key):
+                    image_key = self.generate_image(job, params)
+            else:
+                image_key = self.generate_image(job, params)
+            job.check()
             if self.image_display_mode == "inline":
-                ascii_art = self.generate_ascii_art(img)
-                frame.messages.append({"role": "assistant", "content": ascii_art})
-                frame.text_area.after(0, lambda: self.update_response(frame, ascii_art))
+                ascii_art = self.image_ascii_art(image_key, job)
+                history.append({"role": "assistant", "content": ascii_art, "image": image_key, "art": True})
+                self.ui.post(lambda: self.update_response(frame, ascii_art, rid, job), frame)
             elif self.image_display_mode == "crt":
-                frame.text_area.after(0, lambda: self.show_crt_popup(img))
+                img = self.crt_image(image_key, job)
+                self.ui.post(lambda: self.show_crt_popup(img))
                 notification = f"[Image generated in CRT Popup for: {prompt}]"
-                frame.messages.append({"role": "assistant", "content": notification})
-                frame.text_area.after(0, lambda: self.update_response(frame, notification))
+                history.append({"role": "assistant", "content": notification, "image": image_key})
+                self.ui.post(lambda: self.update_response(frame, notification, rid, job), frame)
+        except RequestCancelled:
+            self.discard_user_message(history, command)
+            raise
         except Exception as e:
             error_message = f"Error generating image: {e}"
-            frame.messages.append({"role": "assistant", "content": error_message})
-            frame.text_area.after(0, lambda: self.update_response(frame, error_message))
-
-    def generate_ascii_art(self, img, new_width=80):
-        img = img.convert("L")
-        width, height = img.size
-        aspect_ratio = height / width
-        new_height = int(aspect_ratio * new_width * 0.55)
-        img = img.resize((new_width, new_height))
-        ascii_chars = "@%#*+=-:. "
-        pixels = img.getdata()
-        ascii_str = ""
-        for i, pixel in enumerate(pixels):
-            ascii_str += ascii_chars[int(pixel / 256 * len(ascii_chars))]
-            if (i + 1) % new_width == 0:
-                ascii_str += "\n"
-        return ascii_str
+            job.metrics["status"] = "error"
+            history.append({"role": "assistant", "content": error_message})
+            self.ui.post(lambda: self.update_response(frame, error_message, rid, job), frame)
+
+    def generate_image(self, job, params):
+        client = self.ensure_client()
+        response = self.scheduler.call(job, lambda: client.images.generate(n=1, **params))
+        item = response.data[0]
+        if getattr(item, "b64_json", None):
+            data = base64.b64decode(item.b64_json)
+        else:
+            data = self.scheduler.call(job, lambda: self.image_pipeline.download(item.url, job))
+        return self.image_pipeline.store(params, data)
+
+    def ascii_charset_chars(self):
+        # Custom charsets are allowed: anything not in ASCII_CHARSETS is used as-is, darkest first.
+        return ASCII_CHARSETS.get(self.ascii_charset, self.ascii_charset) or ASCII_CHARSETS["standard"]
+
+    def generate_ascii_art(self, img, new_width=None):
+        return render_ascii_art(img, new_width or self.ascii_width, self.ascii_charset_chars(), self.ascii_dither)
+
+    def ascii_art_key(self, image_key):
+        return ("stored", image_key, self.ascii_width, self.ascii_charset_chars(), self.ascii_dither)
+
+    def request_ascii_art(self, image_key):
+        # Returns (cached art, None) or (None, future from the image worker pool).
+        key = self.ascii_art_key(image_key)
+        cached = ascii_art_cache.get(key)
+        if cached is not None:
+            return cached, None
+        with self.ascii_lock:
+            future = self.ascii_inflight.get(key)
+            if future is not None:
+                return None, future
+            future = self.image_workers.ascii_art(self.image_pipeline.path_for(image_key), *key[2:])
+            self.ascii_inflight[key] = future
+
+        def done(future):
+            if future.exception() is None:
+                ascii_art_cache.put(key, future.result())
+            with self.ascii_lock:
+                self.ascii_inflight.pop(key, None)
+
+        future.add_done_callback(done)
+        return None, future
+
+    def image_ascii_art(self, image_key, job=None):
+        cached, future = self.request_ascii_art(image_key)
+        if future is None:
+            return cached
+        return self.wait_for_worker(future, job, "ASCII conversion timed out.")
+
+    def crt_image(self, image_key, job=None):
+        # Decoded in the worker processes too, so CRT mode does not stall the main loop either.
+        future = self.image_workers.decoded_image(self.image_pipeline.path_for(image_key))
+        img = self.wait_for_worker(future, job, "Image decode timed out.")
+        img.info["chatlpt_digest"] = f"{image_key}:{img.width}x{img.height}"
+        return img
+
+    def wait_for_worker(self, future, job, timeout_message):
+        TimeoutError = lazy_import("concurrent.futures").TimeoutError
+        deadline = time.monotonic() + ASCII_ART_TIMEOUT
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except TimeoutError:
+                if job is not None:
+                    job.check()
+                if time.monotonic() > deadline:
+                    raise Exception(timeout_message)
+
+    def show_cache_stats(self):
+        win = tk.Toplevel(self.root)
+        win.title("Response Cache")
+        status = "enabled" if self.cache_responses else "disabled (enable in Settings)"
+        tk.Label(win, text=f"Response cache is {status}.").pack(padx=10, pady=5)
+        stats_label = tk.Label(win, justify="left", font=("Courier", 10))
+        stats_label.pack(padx=10, pady=5)
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            stats = self.response_cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            hit_rate = stats["hits"] / lookups * 100 if lookups else 0.0
+            stats_label.config(text=(f"Hits:      {stats['hits']}\n"
+                                     f"Misses:    {stats['misses']}\n"
+                                     f"Hit rate:  {hit_rate:.1f}%\n"
+                                     f"In flight: {stats['inflight']}\n"
+                                     f"In memory: {stats['entries']} entries, {stats['bytes'] / 1024:.1f} KB"))
+            win.after(1000, refresh)
+
+        def clear_cache():
+            if messagebox.askyesno("Response Cache", "Clear all cached responses?", parent=win):
+                self.response_cache.clear()
+
+        tk.Button(win, text="Clear Cache", command=clear_cache).pack(side="left", padx=10, pady=10)
+        tk.Button(win, text="Close", command=win.destroy).pack(side="right", padx=10, pady=10)
+        refresh()
+
+    def show_performance(self):
+        win = tk.Toplevel(self.root)
+        win.title("Performance")
+        tk.Label(win, text=f"Last {TELEMETRY_WINDOW} requests. Log: {self.telemetry.path}"
+                           + ("" if self.telemetry.log else " (disabled)")).pack(padx=10, pady=5)
+        stats_label = tk.Label(win, justify="left", font=("Courier", 10))
+        stats_label.pack(padx=10, pady=5)
+        labels = {"queue_wait": "Queue wait", "network": "Network", "ttft": "First token",
+                  "tokens_per_sec": "Tokens/sec", "render": "Render", "total": "Total",
+                  "ui_stall": "UI stall", "heartbeat": "Main loop"}
+
+        def cell(metric, value):
+            if value is None:
+                return "-"
+            return f"{value:.1f}" if metric == "tokens_per_sec" else f"{value * 1000:.1f} ms"
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            lines = [f"{'':<12}{'n':>6}{'p50':>12}{'p95':>12}{'p99':>12}{'max':>12}"]
+            for metric, row in self.telemetry.summary().items():
+                count, *values = row
+                lines.append(f"{labels[metric]:<12}{count:>6}" + "".join(f"{cell(metric, v):>12}" for v in values))
+            with self.scheduler.cond:
+                queued = sum(len(q) for q in self.scheduler.queues.values())
+                running = len(self.scheduler.running)
+            lines.append(f"\nRunning: {running}   Queued: {queued}")
+            lines.append(f"UI queue: {self.ui.depth()} waiting, peak {self.ui.peak}, tick {self.ui.interval} ms")
+            stats_label.config(text="\n".join(lines))
+            win.after(1000, refresh)
+
+        tk.Button(win, text="Reset", command=self.telemetry.reset).pack(side="left", padx=10, pady=10)
+        tk.Button(win, text="Close", command=win.destroy).pack(side="right", padx=10, pady=10)
+        refresh()
+
+    def set_status_bar(self, show):
+        self.show_status_bar = show
+        if show:
+            last = self.telemetry.last()
+            self.status_bar.config(text=self.status_text(last) if last else "No requests yet.")
+            self.status_bar.pack(side="bottom", fill="x", before=self.notebook)
+        else:
+            self.status_bar.pack_forget()
 
     def show_crt_popup(self, img):
-        popup = tk.Toplevel(self.root)
-        popup.title("CRT Image Display")
-        popup.configure(bg="black")
-        popup.geometry("512x512")
-        photo = ImageTk.PhotoImage(img)
-        label = tk.Label(popup, image=photo, bg="black")
-        label.image = photo  # Keep reference to avoid garbage collection.
-        label.pack(expand=True)
-        popup.after(5000, popup.destroy)
-
-    def update_response(self, frame, processed_text):
-        text_area = frame.text_area
-        current_text = text_area.get("1.0", tk.END)
-        current_text = current_text.replace("[Thinking...]\n", "").replace("[Generating image...]\n", "")
-        text_area.delete("1.0", tk.END)
-        text_area.insert("1.0", current_text)
-        text_area.insert(tk.END, f"{processed_text}\n")
-        self.insert_prompt(frame)
-        text_area.see("end")
+        # One persistent window; closing it only hides it, and the next image reuses it.
+        if self.crt_window is None or not self.crt_window.winfo_exists():
+            win = tk.Toplevel(self.root)
+            win.title("CRT Image Display")
+            win.configure(bg="black")
+            win.geometry("%dx%d" % CRT_DEFAULT_SIZE)
+            win.protocol("WM_DELETE_WINDOW", win.withdraw)
+            self.crt_label = tk.Label(win, bg="black", bd=0, highlightthickness=0)
+            self.crt_label.pack(fill="both", expand=True)
+            win.bind("<Configure>", self.on_crt_configure)
+            win.bind("<F11>", lambda e: self.toggle_crt_fullscreen())
+            win.bind("<Double-Button-1>", lambda e: self.toggle_crt_fullscreen())
+            win.bind("<Escape>", lambda e: self.toggle_crt_fullscreen(False) if win.attributes("-fullscreen") else win.withdraw())
+            self.crt_window = win
+            self.crt_photo = None
+        self.crt_image = img
+        self.crt_window.deiconify()
+        self.crt_window.lift()
+        self.render_crt()
+
+    def toggle_crt_fullscreen(self, fullscreen=None):
+        if fullscreen is None:
+            fullscreen = not self.crt_window.attributes("-fullscreen")
+        self.crt_window.attributes("-fullscreen", fullscreen)
+
+    def on_crt_configure(self, event):
+        if event.widget is not self.crt_window:
+            return
+        size = (event.width, event.height)
+        if size == self.crt_size:
+            return
+        if self.crt_resize_job is not None:
+            self.crt_window.after_cancel(self.crt_resize_job)
+        self.crt_resize_job = self.crt_window.after(80, self.render_crt)
+
+    def render_crt(self):
+        # Rendered off the main thread (PIL releases the GIL); only the newest request is shown.
+        self.crt_resize_job = None
+        img = self.crt_image
+        if img is None:
+            return
+        width, height = self.crt_window.winfo_width(), self.crt_window.winfo_height()
+        size = (width, height) if width > 1 and height > 1 else CRT_DEFAULT_SIZE
+        self.crt_size = size
+        self.crt_generation += 1
+        generation = self.crt_generation
+
+        def work():
+            try:
+                frame = self.crt_renderer.render(img, size)
+                self.ui.post(lambda: self.show_crt_frame(frame, generation))
+            except Exception:
+                pass  # The window (or the app) went away mid-render.
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def show_crt_frame(self, frame, generation):
+        if generation != self.crt_generation or not self.crt_window.winfo_exists():
+            return
+        photo = self.crt_photo
+        if photo is not None and (photo.width(), photo.height()) == frame.size:
+            photo.paste(frame)
+        else:
+            self.crt_photo = lazy_import("PIL.ImageTk").PhotoImage(frame)
+            self.crt_label.config(image=self.crt_photo)
+
+    def update_response(self, frame, processed_text, rid, job=None):
+        start = time.perf_counter()
+        self.insert_reply_text(frame, rid, processed_text)
+        self.finish_reply(frame, rid)
+        if job is not None:
+            self.finish_request(job, time.perf_counter() - start)
+
+    def is_visible_tab(self, frame):
+        return str(frame) == self.notebook.select()
+
+    def finish_request(self, job, render):
+        record = self.telemetry.finish(job, render)
+        if self.show_status_bar:
+            self.status_bar.config(text=self.status_text(record))
+
+    def status_text(self, record):
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.0f} ms"
+        parts = [f"{record['kind']} {record['model'] or ''}".strip(), record["status"],
+                 f"queue {ms(record['queue_wait'])}", f"net {ms(record['network'])}"]
+        if record.get("prompt_tokens") is not None:
+            parts.append(f"prompt {record['prompt_tokens']} tok")
+        if record["ttft"] is not None:
+            parts.append(f"TTFT {ms(record['ttft'])}")
+        if record["tokens"]:
+            rate = f" @ {record['tokens_per_sec']:.1f}/s" if record["tokens_per_sec"] else ""
+            parts.append(f"{record['tokens']} tok{rate}")
+        parts += [f"render {record['render'] * 1000:.1f} ms", f"total {ms(record['total'])}",
+                  f"UI stall {ms(record['ui_stall'])}", f"UI queue {self.ui.depth()}"]
+        return "  |  ".join(parts)
 
     def on_key_press(self, event, frame):
+        frame.last_active = time.monotonic()
+        if self.warm_connections and self.api_key and self.http.needs_warmup():
+            self.http.warm(self.api_base_url)  # the pool went idle; reconnect while the user types
         text_area = frame.text_area
         if text_area.compare("insert", "<", frame.cmd_start):
             text_area.mark_set("insert", frame.cmd_start)
@@ -284,8 +3028,119 @@ class ChatGPTTerminal:
     def scroll_text(self, event, text_area, amount, unit):
         text_area.yview_scroll(amount, unit)
         text_area.mark_set("insert", text_area.index("end-1c"))
+        if amount < 0:
+            self.check_history_top(text_area.master)
         return "break"
 
+    def check_history_top(self, frame):
+        if frame.rendered_from > 0 and frame.history_ready.is_set() and frame.text_area.yview()[0] <= 0.0:
+            self.load_earlier_messages(frame)
+
+    def history_text(self, messages, width=WRAP_COLUMNS):
+        # Stored images in the range are queued first so they reach the worker processes as
+        # one batch; the text is laid out with placeholders that insert_history fills in later.
+        for msg in messages:
+            image_key = msg.get("image")
+            if image_key and self.image_pipeline.has(image_key):
+                self.request_ascii_art(image_key)
+        return join_formatted(self.history_parts(messages, width, self.image_placeholder))
+
+    def history_parts(self, messages, width, image_text):
+        parts = []
+        previous = None
+        for msg in messages:
+            if msg["role"] == "user":
+                parts.append(f"> {msg['content']}\n")
+            elif msg.get("image"):
+                parts += [image_text(msg), "\n"]  # ASCII art keeps its own line breaks
+            elif msg.get("art") or (previous is not None and previous["role"] == "user"
+                                    and previous["content"].startswith("/image ")):
+                parts.append(f"{msg['content']}\n")  # art or a notice saved before images had keys
+            else:
+                parts += [self.preprocess_text(msg["content"], width), "\n"]
+            previous = msg
+        return parts
+
+    def prepend_history(self, frame, stop):
+        # Renders messages[stop:rendered_from] above what is already shown, as one Text insert.
+        text = self.history_text(frame.messages[stop:frame.rendered_from], frame.wrap_width)
+        self.update_history_marker(frame, "")
+        self.insert_history(frame, text)
+        frame.rendered_from = stop
+        self.update_history_marker(frame)
+
+    def insert_history(self, frame, text):
+        text_area = frame.text_area
+        self.insert_formatted(text_area, "1.0", text)
+        for start, end, source in text.regions:
+            self.mark_formatted(frame, self.format_mark_name(), f"1.0 + {start} chars", f"1.0 + {end} chars",
+                                source, frame.wrap_width)
+        for start, end, future in text.images:
+            self.request_counter += 1
+            name = f"img{self.request_counter}"
+            text_area.mark_set(name, f"1.0 + {start} chars")
+            text_area.mark_gravity(name, "right")
+            text_area.mark_set(f"{name}e", f"1.0 + {end} chars")
+            text_area.mark_gravity(f"{name}e", "left")
+            frame.image_marks.add(name)
+            future.add_done_callback(
+                lambda done, name=name: self.ui.post(lambda: self.fill_image_art(frame, name, done), frame))
+
+    def image_placeholder(self, msg):
+        # Stored images are converted in the worker processes; until the art arrives the
+        # text saved with the chat stands in, so laying out history never waits on them.
+        image_key = msg["image"]
+        content = msg["content"] or "[Image]"
+        if not self.image_pipeline.has(image_key):
+            return content
+        cached, future = self.request_ascii_art(image_key)
+        if future is None:
+            return cached.rstrip("\n")
+        placeholder = FormattedText(content)
+        placeholder.pending_art = future
+        return placeholder
+
+    def fill_image_art(self, frame, name, future):
+        if name not in frame.image_marks:
+            return  # the tab was cleared or hibernated meanwhile
+        frame.image_marks.discard(name)
+        text_area = frame.text_area
+        if future.exception() is None:
+            start = text_area.index(name)
+            text_area.delete(start, f"{name}e")
+            text_area.insert(start, future.result().rstrip("\n"))
+        text_area.mark_unset(name, f"{name}e")
+
+    def update_history_marker(self, frame, marker=None):
+        text_area = frame.text_area
+        if text_area.tag_ranges("history_marker"):
+            text_area.delete("history_marker.first", "history_marker.last")
+        if marker is None:
+            if not frame.history_ready.is_set():
+                marker = "[Loading earlier messages...]"
+            elif frame.rendered_from > 0:
+                marker = f"[{frame.rendered_from} earlier messages - scroll up to load more]"
+        if marker:
+            text_area.insert("1.0", f"{marker}\n", ("history_marker",))
+
+    def render_history_batch(self, frame, stop):
+        if not frame.winfo_exists():
+            return
+        if frame.rendered_from <= stop:
+            frame.text_area.edit_reset()
+            return
+        self.prepend_history(frame, max(stop, frame.rendered_from - HISTORY_CHUNK))
+        frame.text_area.see("end")
+        frame.after(1, lambda: self.render_history_batch(frame, stop))
+
+    def load_earlier_messages(self, frame):
+        text_area = frame.text_area
+        top_line = int(text_area.index("@0,0").split(".")[0])
+        lines_before = int(text_area.index("end-1c").split(".")[0])
+        self.prepend_history(frame, max(0, frame.rendered_from - HISTORY_CHUNK))
+        lines_added = int(text_area.index("end-1c").split(".")[0]) - lines_before
+        text_area.yview(f"{top_line + lines_added}.0")
+
     def open_settings(self):
         settings = tk.Toplevel(self.root)
         settings.title("Settings")
@@ -342,11 +3197,76 @@ class ChatGPTTerminal:
                     return
             self.font_family = font_var.get()
             self.image_display_mode = image_mode.get()
+            self.stream_responses = stream_var.get()
+            try:
+                ascii_width = int(ascii_width_entry.get().strip())
+                if ascii_width < 10:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Please enter a valid ASCII art width (number >= 10).")
+                return
+            self.ascii_width = ascii_width
+            self.ascii_charset = charset_var.get() or "standard"
+            self.ascii_dither = dither_var.get()
+            try:
+                keep_last = int(keep_last_entry.get().strip())
+                if keep_last < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Please enter a valid number of messages to keep (number >= 1).")
+                return
+            self.context_keep_last = keep_last
+            try:
+                hibernate_minutes = int(hibernate_entry.get().strip())
+                if hibernate_minutes < 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Please enter a valid number of minutes (0 to never hibernate).")
+                return
+            self.hibernate_idle_minutes = hibernate_minutes
+            self.context_policy = policy_var.get()
+            self.cache_responses = cache_var.get()
+            self.set_status_bar(status_var.get())
             settings.destroy()
             self.update_all_tabs_font()
             self.save_config()
 
-        tk.Button(settings, text="Save", command=save_settings).grid(row=7, column=0, columnspan=2, pady=10)
+        stream_var = tk.BooleanVar(value=self.stream_responses)
+        tk.Checkbutton(settings, text="Stream Responses", variable=stream_var).grid(row=7, column=1, sticky="w", padx=10, pady=2)
+
+        tk.Label(settings, text="ASCII Art Width:").grid(row=8, column=0, padx=10, pady=5, sticky="w")
+        ascii_width_entry = tk.Entry(settings, width=10)
+        ascii_width_entry.grid(row=8, column=1, padx=10, pady=5, sticky="w")
+        ascii_width_entry.insert(0, str(self.ascii_width))
+
+        tk.Label(settings, text="ASCII Charset:").grid(row=9, column=0, padx=10, pady=5, sticky="w")
+        charset_var = tk.StringVar(value=self.ascii_charset)
+        charset_combo = ttk.Combobox(settings, textvariable=charset_var, values=list(ASCII_CHARSETS))
+        charset_combo.grid(row=9, column=1, padx=10, pady=5, sticky="w")
+        dither_var = tk.BooleanVar(value=self.ascii_dither)
+        tk.Checkbutton(settings, text="Dither", variable=dither_var).grid(row=10, column=1, sticky="w", padx=10, pady=2)
+
+        tk.Label(settings, text="Context Policy:").grid(row=11, column=0, padx=10, pady=5, sticky="w")
+        policy_var = tk.StringVar(value=self.context_policy)
+        policy_combo = ttk.Combobox(settings, textvariable=policy_var, values=CONTEXT_POLICIES, state="readonly")
+        policy_combo.grid(row=11, column=1, padx=10, pady=5, sticky="w")
+        tk.Label(settings, text="Keep Last N Messages:").grid(row=12, column=0, padx=10, pady=5, sticky="w")
+        keep_last_entry = tk.Entry(settings, width=10)
+        keep_last_entry.grid(row=12, column=1, padx=10, pady=5, sticky="w")
+        keep_last_entry.insert(0, str(self.context_keep_last))
+
+        cache_var = tk.BooleanVar(value=self.cache_responses)
+        tk.Checkbutton(settings, text="Cache Responses", variable=cache_var).grid(row=13, column=1, sticky="w", padx=10, pady=2)
+
+        status_var = tk.BooleanVar(value=self.show_status_bar)
+        tk.Checkbutton(settings, text="Show Status Bar", variable=status_var).grid(row=14, column=1, sticky="w", padx=10, pady=2)
+
+        tk.Label(settings, text="Hibernate Idle Tabs (min):").grid(row=15, column=0, padx=10, pady=5, sticky="w")
+        hibernate_entry = tk.Entry(settings, width=10)
+        hibernate_entry.grid(row=15, column=1, padx=10, pady=5, sticky="w")
+        hibernate_entry.insert(0, str(self.hibernate_idle_minutes))
+
+        tk.Button(settings, text="Save", command=save_settings).grid(row=16, column=0, columnspan=2, pady=10)
 
     def clear_session(self, event=None):
         try:
@@ -357,7 +3277,20 @@ class ChatGPTTerminal:
         answer = messagebox.askyesno("Clear Session", "Are you sure you want to clear the current session? This cannot be undone.")
         if not answer:
             return
-        current_tab.messages = [{"role": "system", "content": "You are a helpful assistant."}]
+        self.wake_tab(current_tab)
+        # In-flight replies belong to the old session: cancel them, and detach the old list from
+        # the journal so a turn they finish anyway is not written into the cleared chat.
+        self.scheduler.cancel(current_tab)
+        current_tab.messages.journal = None
+        current_tab.messages = ChatHistory([{"role": "system", "content": SYSTEM_PROMPT}])
+        if current_tab.journal is not None:
+            current_tab.journal.rewrite(current_tab.messages)
+            current_tab.messages.journal = current_tab.journal
+        for rid in current_tab.pending:
+            current_tab.text_area.mark_unset(rid)
+        current_tab.pending.clear()
+        self.forget_formatted(current_tab)
+        current_tab.rendered_from = 0
         current_tab.text_area.delete("1.0", tk.END)
         self.insert_prompt(current_tab)
 
@@ -377,81 +3310,295 @@ class ChatGPTTerminal:
         )
         if not file_path:
             return
+        if not current_tab.history_ready.is_set():
+            messagebox.showinfo("Save Chat", "This chat is still loading. Please try again in a moment.")
+            return
+        self.wake_tab(current_tab)
+        # Written as a .lpt v2 journal; later messages are appended to the same file as they arrive.
+        journal = current_tab.journal
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(current_tab.messages, f, indent=2)
+            self.journal_writer.call(lambda: journal.write_all(list(current_tab.messages), file_path))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save chat: {e}")
+            return
+        self.search_index.index(file_path)
 
-    def open_chat(self):
-        file_path = filedialog.askopenfilename(
-            title="Open Chat",
-            filetypes=[("ChatLPT Files", "*.lpt"), ("All Files", "*.*")]
-        )
+    def open_chat(self, file_path=None, autosave=False):
+        if file_path is None:
+            file_path = filedialog.askopenfilename(
+                title="Open Chat",
+                filetypes=[("ChatLPT Files", "*.lpt"), ("All Files", "*.*")]
+            )
         if not file_path:
             return
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                messages = json.load(f)
+            journaled = lpt_is_journal(file_path)
+            if journaled:
+                # Only the tail is parsed now; the full history loads in the background.
+                messages, total = read_lpt_tail(file_path, self.lazy_render_messages)
+                if total == len(messages):
+                    messages, state = read_lpt(file_path)  # small enough to take whole
+            else:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    messages = json.load(f)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open chat: {e}")
             return
-        new_tab = ttk.Frame(self.notebook)
         tab_name = os.path.basename(file_path).rsplit(".", 1)[0]
-        self.notebook.add(new_tab, text=tab_name)
-        text_area = tk.Text(new_tab, bg="black", fg="lime", insertbackground="lime",
-                            wrap="word", undo=True)
-        text_area.pack(fill="both", expand=True)
-        text_area.config(font=(self.font_family, self.default_font_size))
-        current_font = font.Font(font=text_area.cget("font"))
-        text_area.config(insertwidth=current_font.measure("0"), insertontime=600, insertofftime=400)
-        new_tab.text_area = text_area
-        new_tab.messages = messages
-        text_area.delete("1.0", tk.END)
-        for msg in messages:
-            if msg["role"] == "user":
-                text_area.insert(tk.END, f"> {msg['content']}\n")
-            else:
-                wrapped = self.preprocess_text(msg["content"])
-                text_area.insert(tk.END, f"{wrapped}\n")
+        new_tab = self.build_tab(tab_name)
+        new_tab.messages = ChatHistory(messages)
+        new_tab.rendered_from = len(messages)
+        if journaled and total != len(messages):
+            new_tab.history_ready.clear()
+            threading.Thread(target=self.load_full_history,
+                             args=(new_tab, file_path, new_tab.messages, autosave), daemon=True).start()
+        elif journaled:
+            self.attach_journal(new_tab, ChatJournal(file_path, self.journal_writer, autosave=autosave, state=state))
+        else:
+            # Version 1 files are never rewritten in place; the conversation continues in an autosave.
+            self.attach_journal(new_tab, ChatJournal(self.autosave_path(), self.journal_writer,
+                                                     autosave=True, seed=new_tab.messages))
+        # Only the last lazy_render_messages are drawn, newest chunk first; earlier ones load on scroll-up.
+        stop = max(0, len(messages) - self.lazy_render_messages)
+        self.prepend_history(new_tab, max(stop, len(messages) - HISTORY_CHUNK))
         self.insert_prompt(new_tab)
         self.notebook.select(new_tab)
-        text_area.bind("<Alt-Return>", lambda e: self.toggle_fullscreen(e) or "break")
-        text_area.bind("<Return>", lambda e, f=new_tab: self.on_return(e, f))
-        text_area.bind("<Key>", lambda e, f=new_tab: self.on_key_press(e, f))
-        text_area.bind("<Up>", lambda e, tw=text_area: self.scroll_text(e, tw, -1, "units"))
-        text_area.bind("<Down>", lambda e, tw=text_area: self.scroll_text(e, tw, 1, "units"))
-        text_area.bind("<Prior>", lambda e, tw=text_area: self.scroll_text(e, tw, -1, "pages"))
-        text_area.bind("<Next>", lambda e, tw=text_area: self.scroll_text(e, tw, 1, "pages"))
+        new_tab.text_area.see("end")
+        new_tab.after(1, lambda: self.render_history_batch(new_tab, stop))
 
-    def list_models(self):
-        threading.Thread(target=self._list_models_thread, daemon=True).start()
+    def load_full_history(self, frame, file_path, tail, autosave):
+        try:
+            messages, state = read_lpt(file_path)
+        except Exception:
+            messages, state = list(tail), None
+        try:
+            self.ui.post(lambda: self.history_loaded(frame, file_path, tail, messages, state, autosave), frame)
+        except (tk.TclError, RuntimeError):
+            pass  # The tab was closed while loading.
+
+    def history_loaded(self, frame, file_path, tail, messages, state, autosave):
+        if state is None:
+            # Unreadable beyond the tail: keep what we have, and never append to that file.
+            journal = ChatJournal(self.autosave_path(), self.journal_writer, autosave=True, seed=frame.messages)
+        else:
+            journal = ChatJournal(file_path, self.journal_writer, autosave=autosave, state=state)
+        if frame.messages is tail and state is not None:
+            frame.rendered_from += len(messages) - len(tail)
+            frame.messages = ChatHistory(messages)
+            self.attach_journal(frame, journal)
+        else:
+            self.attach_journal(frame, journal)
+            if state is not None:
+                journal.rewrite(frame.messages)  # the session was cleared while loading
+        frame.history_ready.set()
+        self.update_history_marker(frame)
+
+    def show_search(self):
+        win = tk.Toplevel(self.root)
+        win.title("Search Chats")
+        query_entry = tk.Entry(win, width=60)
+        query_entry.pack(fill="x", padx=10, pady=5)
+        results = tk.Listbox(win, width=100, height=20, font=("Courier", 10))
+        results.pack(fill="both", expand=True, padx=10)
+        status = tk.Label(win, anchor="w")
+        status.pack(fill="x", padx=10)
+        hits = []
+        pending = [None]
+
+        def run_search():
+            pending[0] = None
+            text = query_entry.get().strip()
+            start = time.perf_counter()
+            hits[:] = self.search_open_tabs(text)
+            try:
+                hits.extend(("file", path, title, idx, role, snippet)
+                            for path, title, idx, role, snippet in self.search_index.search(text))
+                note = ""
+            except Exception as e:
+                note = f" (saved chats unavailable: {self.search_index.error or e})"
+            elapsed = (time.perf_counter() - start) * 1000
+            results.delete(0, tk.END)
+            for kind, target, title, idx, role, snippet in hits:
+                where = f"[tab] {title}" if kind == "tab" else title
+                results.insert(tk.END, f"{where[:24]:<24} #{idx:<6} {role[:9]:<9} {' '.join(snippet.split())}")
+            status.config(text=f"{len(hits)} hits in {elapsed:.1f} ms{note}" if text else "")
+
+        def schedule_search(event=None):
+            if pending[0] is not None:
+                win.after_cancel(pending[0])
+            pending[0] = win.after(150, run_search)
+
+        def open_hit(event=None):
+            selection = results.curselection()
+            if selection:
+                kind, target, title, idx, role, snippet = hits[selection[0]]
+                self.open_search_hit(kind, target, idx)
+
+        def index_folder():
+            directory = filedialog.askdirectory(title="Index Folder", parent=win)
+            if directory:
+                self.search_index.watch(directory)
+                self.save_config()
+                status.config(text=f"Indexing {directory} in the background...")
+
+        query_entry.bind("<KeyRelease>", schedule_search)
+        query_entry.bind("<Return>", lambda e: run_search())
+        results.bind("<Double-Button-1>", open_hit)
+        results.bind("<Return>", open_hit)
+        tk.Button(win, text="Index Folder...", command=index_folder).pack(side="left", padx=10, pady=10)
+        tk.Button(win, text="Open", command=open_hit).pack(side="left", padx=10, pady=10)
+        tk.Button(win, text="Close", command=win.destroy).pack(side="right", padx=10, pady=10)
+        query_entry.focus_set()
+
+    def search_open_tabs(self, text, limit=SEARCH_RESULTS):
+        # Open tabs may hold unsaved messages, so they are scanned directly rather than indexed.
+        terms = text.lower().split()
+        if not terms:
+            return []
+        hits = []
+        for tab_id in self.notebook.tabs():
+            frame = self.notebook.nametowidget(tab_id)
+            if frame.hibernated is not None:
+                continue  # found through the search index instead
+            title = self.notebook.tab(tab_id, "text")
+            for idx, msg in enumerate(frame.messages):
+                if not searchable(msg):
+                    continue
+                content = msg["content"]
+                lower = content.lower()
+                if all(term in lower for term in terms):
+                    at = lower.find(terms[0])
+                    snippet = content[max(0, at - 30):at + 60]
+                    score = sum(lower.count(term) for term in terms)
+                    hits.append((score, ("tab", frame, title, idx, msg["role"], snippet)))
+        hits.sort(key=lambda hit: -hit[0])
+        return [hit for score, hit in hits[:limit]]
+
+    def open_search_hit(self, kind, target, idx):
+        frame = target if kind == "tab" else None
+        if frame is None:
+            path = os.path.abspath(target)
+            for tab_id in self.notebook.tabs():
+                tab = self.notebook.nametowidget(tab_id)
+                if tab.journal is not None and os.path.abspath(tab.journal.path) == path:
+                    frame = tab
+                    break
+        if frame is None:
+            tabs_before = set(self.notebook.tabs())
+            self.open_chat(target)
+            opened = set(self.notebook.tabs()) - tabs_before
+            if not opened:
+                return
+            frame = self.notebook.nametowidget(opened.pop())
+        if not frame.winfo_exists():
+            return
+        self.notebook.select(frame)
+        self.wake_tab(frame)
+        self.scroll_to_message(frame, idx)
+
+    def scroll_to_message(self, frame, idx):
+        if not frame.winfo_exists():
+            return
+        if not frame.history_ready.is_set():
+            frame.after(50, lambda: self.scroll_to_message(frame, idx))
+            return
+        if idx >= len(frame.messages):
+            return
+        if idx < frame.rendered_from:
+            self.prepend_history(frame, idx)
+        text_area = frame.text_area
+        first_line = self.message_display_text(frame.messages[idx]).strip().split("\n", 1)[0][:80]
+        start = "history_marker.last" if text_area.tag_ranges("history_marker") else "1.0"
+        # Measured with whatever art is already converted, so nothing new is queued.
+        parts = self.history_parts(frame.messages[frame.rendered_from:idx], frame.wrap_width, self.message_display_text)
+        offset = sum(len(part) for part in parts)
+        position = text_area.index(f"{start} + {offset} chars")
+        if first_line and first_line not in text_area.get(position, f"{position} lineend"):
+            # Messages typed in this session are laid out slightly differently from history.
+            position = text_area.search(first_line, start, stopindex="end") or position
+        text_area.tag_remove("search_hit", "1.0", "end")
+        text_area.tag_add("search_hit", f"{position} linestart", f"{position} lineend")
+        text_area.tag_config("search_hit", background="#005500", foreground="white")
+        text_area.see(position)
+
+    def message_display_text(self, msg):
+        # Images saved with a chat are re-rendered from the local store at the current width,
+        # once the worker processes have converted them (see image_placeholder).
+        image_key = msg.get("image")
+        if image_key and self.image_pipeline.has(image_key):
+            cached = ascii_art_cache.get(self.ascii_art_key(image_key))
+            if cached is not None:
+                return cached.rstrip("\n")
+        return msg["content"]
 
-    def _list_models_thread(self):
+    def list_models(self):
         if not self.api_key:
-            self.root.after(0, lambda: messagebox.showerror("Error", "API key is not provided. Please set your API key in Settings."))
+            messagebox.showerror("Error", "API key is not provided. Please set your API key in Settings.")
+            return
+        if self.model_catalog.models(self.api_base_url):
+            # Opens from the saved catalog; a stale one is refreshed behind the window.
+            self.show_model_list()
+            self.refresh_models()
+        else:
+            self.refresh_models(show=True)
+
+    def refresh_models(self, show=False):
+        if not self.api_key or not (show or self.model_catalog.is_stale(self.api_base_url)):
             return
+        if self.model_catalog.begin_refresh():
+            self.scheduler.submit("models", lambda job: self._list_models_thread(job, show))
+
+    def _list_models_thread(self, job, show):
+        job.metrics["kind"] = "models"
         try:
-            models = self.client.models.list()
-            model_list = [m.id for m in models.data if "gpt" in m.id.lower()]
-            self.root.after(0, lambda: self.show_model_list(model_list))
+            client = self.ensure_client()
+            models = self.scheduler.call(job, lambda: client.models.list())
+            self.model_catalog.update(self.api_base_url, models.data)
+            self.ui.post(lambda: self.show_models_timed(job, show))
         except Exception as ex:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to list models: {ex}"))
+            job.metrics["status"] = "error"
+            self.ui.post(lambda: self.finish_request(job, 0.0))
+            if show:
+                self.ui.post(lambda: messagebox.showerror("Error", f"Failed to list models: {ex}"))
+        finally:
+            self.model_catalog.end_refresh()
+
+    def show_models_timed(self, job, show):
+        start = time.perf_counter()
+        if show:
+            self.show_model_list()
+        elif self.model_listbox is not None and self.model_listbox.winfo_exists():
+            self.fill_model_list(self.model_listbox)
+        self.finish_request(job, time.perf_counter() - start)
+
+    def chat_models(self):
+        models = self.model_catalog.models(self.api_base_url)
+        return [(model_id, meta) for model_id, meta in models.items() if "gpt" in model_id.lower()]
+
+    def fill_model_list(self, listbox):
+        listbox.delete(0, tk.END)
+        for model_id, meta in self.chat_models():
+            window = meta["context_window"]
+            size = f"{window // 1000}k" if window < 1000000 else f"{window / 1000000:.1f}M"
+            features = ", ".join(name for name, key in (("vision", "vision"), ("image", "image_generation")) if meta[key])
+            listbox.insert(tk.END, f"{model_id:<34}{size:>7}  {features}")
+        age = int(self.model_catalog.age() / 60)
+        listbox.winfo_toplevel().title(f"Available GPT Models (updated {age} min ago)")
 
-    def show_model_list(self, model_list):
+    def show_model_list(self):
         win = tk.Toplevel(self.root)
         win.title("Available GPT Models")
-        listbox = tk.Listbox(win, width=50, height=20)
+        listbox = tk.Listbox(win, width=60, height=20, font=("Courier", 10))
         listbox.pack(side="left", fill="both", expand=True)
         scrollbar = tk.Scrollbar(win)
         scrollbar.pack(side="right", fill="y")
         listbox.config(yscrollcommand=scrollbar.set)
         scrollbar.config(command=listbox.yview)
-        for m in model_list:
-            listbox.insert(tk.END, m)
+        self.fill_model_list(listbox)
+        self.model_listbox = listbox
         def select_model():
             try:
-                selection = listbox.get(listbox.curselection())
+                selection = listbox.get(listbox.curselection()).split()[0]
                 self.current_model = selection
                 messagebox.showinfo("Model Selected", f"Selected model: {selection}")
                 win.destroy()
@@ -517,6 +3664,7 @@ class ChatGPTTerminal:
     def setup_bindings(self):
         self.root.bind_all("<Alt-Return>", self.toggle_fullscreen)
         self.root.bind_all("<F3>", self.clear_session)
+        self.root.bind_all("<Control-F>", lambda e: self.show_search())
 
     def toggle_fullscreen(self, event=None):
         self.fullscreen = not self.fullscreen
@@ -550,25 +3698,318 @@ class ChatGPTTerminal:
             frame.text_area.config(font=(self.font_family, new_size))
             current_font = font.Font(font=frame.text_area.cget("font"))
             frame.text_area.config(insertwidth=current_font.measure("0") - 2)
+            self.configure_format_tags(frame.text_area, new_size)
+            self.update_wrap_width(frame)
+
+    def configure_format_tags(self, text_area, size):
+        text_area.tag_config("md_heading", font=(self.font_family, size, "bold", "underline"), foreground="#ccffcc")
+        text_area.tag_config("md_bold", font=(self.font_family, size, "bold"))
+        text_area.tag_config("md_italic", font=(self.font_family, size, "italic"))
+        text_area.tag_config("md_code", background="#0b2a0b")
+        text_area.tag_config("md_fence", foreground="#2f8f2f")
+
+    def preprocess_text(self, text, width=WRAP_COLUMNS):
+        # Markdown-ish formatting for the terminal: prose wrapped to width, code fences kept
+        # verbatim, and headings, code and emphasis returned as tag spans. Memoized per
+        # (text, width), so re-rendering history or re-wrapping costs a lookup.
+        return format_message(text, width)
+
+    def wrap_columns(self, frame):
+        text_area = frame.text_area
+        width = text_area.winfo_width()
+        if width <= 1:
+            return frame.wrap_width  # not laid out yet
+        char_width = max(font.Font(font=text_area.cget("font")).measure("0"), 1)
+        pad = 2 * sum(text_area.winfo_pixels(text_area.cget(option))
+                      for option in ("padx", "borderwidth", "highlightthickness"))
+        return max(20, min(WRAP_COLUMNS, (width - pad) // char_width))
+
+    def schedule_wrap_update(self, frame):
+        # Resizes arrive in bursts; only the last one re-wraps.
+        if frame.wrap_pending is not None:
+            frame.after_cancel(frame.wrap_pending)
+        frame.wrap_pending = frame.after(100, lambda: self.update_wrap_width(frame))
+
+    def update_wrap_width(self, frame):
+        frame.wrap_pending = None
+        if not frame.winfo_exists():
+            return
+        width = self.wrap_columns(frame)
+        if width == frame.wrap_width:
+            return
+        frame.wrap_width = width
+        frame.stale_wraps = sum(1 for _, wrapped in frame.formatted.values() if wrapped != width)
+        self.rewrap_visible(frame)
 
-    def preprocess_text(self, text, width=80):
-        return text
+    def on_text_scroll(self, frame):
+        if frame.stale_wraps and frame.rewrap_pending is None:
+            frame.rewrap_pending = frame.after_idle(lambda: self.rewrap_visible(frame))
+
+    def rewrap_visible(self, frame):
+        # Only formatted messages overlapping the view are re-wrapped; the rest keep their
+        # old width until they are scrolled into view (see on_text_scroll).
+        frame.rewrap_pending = None
+        if not frame.winfo_exists() or not frame.stale_wraps:
+            return
+        text_area = frame.text_area
+        top = text_area.index("@0,0")
+        bottom = text_area.index(f"@0,{text_area.winfo_height()}")
+        names = []
+        mark = text_area.mark_previous(top)
+        while mark:
+            if mark in frame.formatted:
+                names.append(mark)  # a message that starts above the view and may reach into it
+                break
+            if mark.endswith("e") and mark[:-1] in frame.formatted:
+                break
+            mark = text_area.mark_previous(mark)
+        mark = text_area.mark_next(top)
+        while mark and text_area.compare(mark, "<=", bottom):
+            if mark in frame.formatted and mark not in names:
+                names.append(mark)
+            mark = text_area.mark_next(mark)
+        stale = [name for name in names if frame.formatted[name][1] != frame.wrap_width]
+        if not stale:
+            return
+        text_area.mark_set("wrap_view", top)
+        text_area.mark_gravity("wrap_view", "left")
+        for name in stale:
+            source = frame.formatted[name][0]
+            formatted = format_message(source, frame.wrap_width)
+            start = text_area.index(name)
+            text_area.delete(start, f"{name}e")
+            self.insert_formatted(text_area, start, formatted)
+            text_area.mark_set(name, start)
+            text_area.mark_set(f"{name}e", f"{start} + {len(formatted)} chars")
+            frame.formatted[name] = (source, frame.wrap_width)
+            frame.stale_wraps -= 1
+        text_area.yview("wrap_view")
+        text_area.mark_unset("wrap_view")
 
     def get_chatgpt_response(self, messages):
         if not self.api_key:
             return "Error: API key is not provided. Please set your API key in Settings."
         try:
-            response = self.client.chat.completions.create(
+            response = self.ensure_client().chat.completions.create(
                 model=self.current_model,
                 messages=messages,
-                temperature=0.8
+                temperature=CHAT_TEMPERATURE
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
             return f"Error: {e}"
 
+
+class RateLimiter:
+    # Spaces calls evenly at `per_minute` across all threads; 0 means unlimited.
+    def __init__(self, per_minute=0):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, job=None):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if wait > 0 and job is not None and job.cancelled.wait(wait):
+            raise RequestCancelled()
+        if wait > 0 and job is None:
+            time.sleep(wait)
+
+
+def read_batch_input(path):
+    # Yields (id, seed messages, prompts). JSONL lines hold "prompt" or "prompts" and
+    # optionally "id", "system" and seed "messages"; CSV files need a "prompt" column.
+    if path.lower().endswith(".csv"):
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for n, row in enumerate(lazy_import("csv").DictReader(f), 1):
+                yield batch_conversation(row, n)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                if line.strip():
+                    yield batch_conversation(json.loads(line), n)
+
+
+def batch_conversation(record, n):
+    conversation_id = str(record.get("id") or n)
+    messages = [{"role": m["role"], "content": m["content"]} for m in record.get("messages") or []]
+    if not messages or messages[0]["role"] != "system":
+        messages.insert(0, {"role": "system", "content": record.get("system") or SYSTEM_PROMPT})
+    prompts = record.get("prompts") or record.get("prompt") or []
+    if isinstance(prompts, str):
+        prompts = [prompts]
+    return conversation_id, messages, prompts
+
+
+class BatchRunner:
+    # Runs conversations through the same scheduler, context trimming, model and temperature
+    # as the chat tabs, writing each one as a .lpt file. Progress is appended to
+    # batch_progress.jsonl in the output directory, so an interrupted run resumes where it stopped.
+    def __init__(self, config, output_dir, concurrency=4, rate_per_minute=0, stream=False, out=sys.stdout):
+        self.api_key = config.get("api_key") or os.environ.get("OPENAI_API_KEY")
+        self.model = config.get("current_model", "gpt-3.5-turbo")
+        self.api_base_url = config.get("api_base_url")
+        self.request_timeout = config.get("request_timeout", 60)
+        self.context_keep_last = config.get("context_keep_last", 20)
+        self.context_reserve_tokens = config.get("context_reserve_tokens", 1024)
+        self.output_dir = output_dir
+        self.progress_path = os.path.join(output_dir, "batch_progress.jsonl")
+        self.stream = stream
+        self.out = out
+        self.limiter = RateLimiter(rate_per_minute)
+        self.scheduler = RequestScheduler(max_workers=concurrency, per_model_limit=concurrency,
+                                          max_retries=config.get("max_retries", 4))
+        self.slots = threading.BoundedSemaphore(concurrency * 2)  # bounds conversations held in memory
+        self.writer = JournalWriter()
+        self.lock = threading.Lock()
+        self.http = HttpPool(max_connections=concurrency, keepalive=config.get("http_keepalive_seconds", 60),
+                             connect_timeout=config.get("http_connect_timeout", 5), read_timeout=self.request_timeout)
+        self.client = None
+        self.model_catalog = ModelCatalog()  # read only; the app keeps it fresh
+        self.counts = {"ok": 0, "error": 0, "skipped": 0}
+
+    def completed(self):
+        done = set()
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    if record.get("status") == "ok":
+                        done.add(record["id"])
+        return done
+
+    def run(self, conversations):
+        if not self.api_key:
+            raise SystemExit("No API key: set it in Settings or in OPENAI_API_KEY.")
+        self.client = self.http.api_client(self.api_key, self.api_base_url)
+        os.makedirs(self.output_dir, exist_ok=True)
+        done = self.completed()
+        self.progress = open(self.progress_path, "a", encoding="utf-8")
+        try:
+            for conversation in conversations:
+                if conversation[0] in done:
+                    self.counts["skipped"] += 1
+                    continue
+                self.slots.acquire()
+                self.scheduler.submit(conversation[0], lambda job, c=conversation: self.run_conversation(job, *c),
+                                      model=self.model)
+            with self.scheduler.cond:
+                while self.scheduler.queues or self.scheduler.running:
+                    self.scheduler.cond.wait(0.5)
+        finally:
+            self.scheduler.shutdown()
+            self.http.close()
+            self.writer.flush()
+            self.progress.close()
+        return self.counts
+
+    def run_conversation(self, job, conversation_id, messages, prompts):
+        try:
+            history = ChatHistory(messages)
+            reply = None
+            for prompt in prompts or [None]:
+                if prompt is not None:
+                    history.append({"role": "user", "content": prompt})
+                elif history[-1]["role"] != "user":
+                    break  # a seed conversation with nothing left to answer
+                reply = self.complete(job, conversation_id, history)
+                history.append({"role": "assistant", "content": reply})
+            path = self.write_lpt(conversation_id, history)
+            self.record({"id": conversation_id, "status": "ok", "file": path, "reply": reply})
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            self.record({"id": conversation_id, "status": "error", "error": str(e)})
+        finally:
+            self.slots.release()
+
+    def complete(self, job, conversation_id, history):
+        budget = self.model_catalog.context_window(self.model, self.api_base_url) - self.context_reserve_tokens
+        messages, prompt_tokens = history.build(budget, "sliding", self.context_keep_last)
+
+        def request():
+            self.limiter.acquire(job)
+            return self.client.chat.completions.create(model=self.model, messages=messages,
+                                                       temperature=CHAT_TEMPERATURE, stream=self.stream)
+
+        response = self.scheduler.call(job, request)
+        if not self.stream:
+            return response.choices[0].message.content.strip()
+        parts = []
+        for chunk in response:
+            job.check()
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                self.emit({"id": conversation_id, "delta": delta})
+        return "".join(parts).strip()
+
+    def write_lpt(self, conversation_id, history):
+        name = "".join(c if c.isalnum() or c in "-_." else "_" for c in conversation_id)[:100] or "conversation"
+        path = os.path.join(self.output_dir, f"{name}.lpt")
+        if os.path.exists(path):
+            os.remove(path)  # left by an interrupted run; redone from the start
+        journal = ChatJournal(path, self.writer)
+        self.writer.call(lambda: journal.write_all(list(history)))
+        journal.close()
+        return path
+
+    def record(self, event):
+        with self.lock:
+            self.counts[event["status"]] += 1
+            self.progress.write(json.dumps({k: v for k, v in event.items() if k != "reply"}) + "\n")
+            self.progress.flush()
+            self.emit(event)
+            print(f"[{self.counts['ok']} ok, {self.counts['error']} failed] {event['id']}: {event['status']}",
+                  file=sys.stderr, flush=True)
+
+    def emit(self, event):
+        self.out.write(json.dumps(event) + "\n")
+        self.out.flush()
+
+
+def run_batch(args):
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    if args.model:
+        config["current_model"] = args.model
+    runner = BatchRunner(config, args.output_dir, args.concurrency, args.rate, args.stream)
+    try:
+        counts = runner.run(read_batch_input(args.batch))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.", file=sys.stderr)
+        return 130
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} already done.", file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ChatLPT Graphics")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import and initialization time per startup phase, then exit")
+    batch = parser.add_argument_group("batch mode (no window)")
+    batch.add_argument("--batch", metavar="FILE", help="run the prompts or conversations in a .jsonl or .csv file")
+    batch.add_argument("--output-dir", default="batch_output", help="where .lpt results and progress are written")
+    batch.add_argument("--concurrency", type=int, default=4, help="conversations run at once")
+    batch.add_argument("--rate", type=float, default=0, help="maximum requests per minute (0 = unlimited)")
+    batch.add_argument("--model", help="model to use instead of the one selected in the app")
+    batch.add_argument("--stream", action="store_true", help="stream reply tokens to stdout as they arrive")
+    args = parser.parse_args()
+    if args.batch:
+        sys.exit(run_batch(args))
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    profiler.mark("imports")
     root = tk.Tk()
     root.title("ChatLPT Graphics")
-    app = ChatGPTTerminal(root)
+    profiler.mark("tk root")
+    app = ChatGPTTerminal(root, profiler)
     root.mainloop()
@@ -0,0 +1,388 @@
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter as tk
+from io import BytesIO
+from types import SimpleNamespace
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ChatLPT.Graphics.py")
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location("chatlpt_graphics", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # so worker processes can find its functions by name
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeCompletions:
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, model, messages, temperature=None, stream=False, timeout=None, **kwargs):
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        self.client.calls += 1
+        text = self.client.reply
+        if not stream:
+            message = SimpleNamespace(content=text)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+        return FakeStream(text)
+
+
+class FakeStream:
+    def __init__(self, text):
+        self.words = [word + " " for word in text.split(" ")]
+
+    def __iter__(self):
+        for word in self.words:
+            delta = SimpleNamespace(content=word)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+    def close(self):
+        pass
+
+
+class FakeClient:
+    # Stands in for openai.OpenAI: same attribute paths, canned results, optional latency.
+    def __init__(self, reply="A short assistant reply that is about one line long.", latency=0.0, image_size=512):
+        self.api_key = "bench"
+        self.reply = reply
+        self.latency = latency
+        self.image_size = image_size
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=FakeCompletions(self))
+        self.models = SimpleNamespace(list=lambda: SimpleNamespace(
+            data=[SimpleNamespace(id=name) for name in ("gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini")]))
+        self.images = SimpleNamespace(generate=self.generate_image)
+
+    def generate_image(self, **kwargs):
+        from PIL import Image
+        buf = BytesIO()
+        Image.effect_noise((self.image_size, self.image_size), 64).convert("RGB").save(buf, "PNG")
+        item = SimpleNamespace(url=None, b64_json=base64.b64encode(buf.getvalue()).decode("ascii"))
+        return SimpleNamespace(data=[item])
+
+
+class BenchResults:
+    def __init__(self):
+        self.records = []
+
+    def add(self, name, seconds, runs=1, **params):
+        record = {"name": name, "params": params, "runs": runs, "seconds": seconds,
+                  "seconds_per_run": seconds / runs if runs else seconds}
+        self.records.append(record)
+        detail = " ".join(f"{key}={value}" for key, value in params.items())
+        print(f"{name:<28} {detail:<40} {record['seconds_per_run'] * 1000:10.3f} ms/run", file=sys.stderr)
+
+    def to_json(self):
+        return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tk": tk.TkVersion,
+            "timestamp": time.time(),
+            "results": self.records,
+        }
+
+
+def make_app(module, client=None):
+    root = tk.Tk()
+    root.withdraw()
+    app = module.ChatGPTTerminal(root)
+    app.preload_modules = False
+    app.api_key = "bench"
+    app.client = client or FakeClient()
+    app.stream_responses = False
+    app.hibernate_idle_minutes = 0
+    app.hibernate_budget_mb = 0
+    pump(root)
+    return root, app
+
+
+def pump(root, until=None, timeout=60.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        root.update()
+        if until is None or until() or time.perf_counter() > deadline:
+            return
+        time.sleep(0.0005)
+
+
+def current_tab(app):
+    return app.notebook.nametowidget(app.notebook.tabs()[-1])
+
+
+def fill_transcript(frame, size):
+    line = "The quick brown fox jumps over the lazy dog. " * 2 + "\n"
+    frame.text_area.insert("1.0", line * (size // len(line) + 1))
+
+
+def legacy_update_response(app, frame, processed_text):
+    # The previous implementation: rewrite the whole buffer to drop the placeholder.
+    text_area = frame.text_area
+    current_text = text_area.get("1.0", tk.END)
+    current_text = current_text.replace("[Thinking...]\n", "").replace("[Generating image...]\n", "")
+    text_area.delete("1.0", tk.END)
+    text_area.insert("1.0", current_text)
+    text_area.insert(tk.END, f"{processed_text}\n")
+    app.insert_prompt(frame)
+    text_area.see("end")
+
+
+def bench_create_new_tab(module, results, count=50):
+    root, app = make_app(module)
+    start = time.perf_counter()
+    for _ in range(count):
+        app.create_new_tab()
+    root.update_idletasks()
+    results.add("create_new_tab", time.perf_counter() - start, count)
+    root.destroy()
+
+
+def bench_update_response(module, results, sizes=(1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024), replies=20):
+    root, app = make_app(module)
+    reply = "A short assistant reply that is about one line long."
+    for size in sizes:
+        for mode in ("incremental", "legacy"):
+            frame = current_tab(app)
+            frame.text_area.delete("1.0", tk.END)
+            fill_transcript(frame, size)
+            app.insert_prompt(frame)
+            root.update()
+            start = time.perf_counter()
+            for _ in range(replies):
+                if mode == "incremental":
+                    rid = app.insert_placeholder(frame, "[Thinking...]")
+                    app.update_response(frame, reply, rid)
+                else:
+                    frame.text_area.insert("end", "[Thinking...]\n")
+                    legacy_update_response(app, frame, reply)
+                root.update_idletasks()
+            results.add("update_response", time.perf_counter() - start, replies, mode=mode, transcript_bytes=size)
+    root.destroy()
+
+
+def check_reply_placement(app, frame):
+    # The reply belongs above the new prompt; anything after cmd_start would be sent with the next command.
+    text_area = frame.text_area
+    typed = text_area.get("cmd_start", "end-1c")
+    above = text_area.get("1.0", "cmd_start").rstrip()
+    if typed or not above.endswith(">") or app.client.reply.split()[-1] not in above[-200:]:
+        raise SystemExit(f"Reply was not drawn above the prompt: {above[-200:]!r} | {typed!r}")
+
+
+def bench_round_trip(module, results, sizes=(10 * 1024, 1024 * 1024, 10 * 1024 * 1024), turns=10):
+    # on_return -> scheduler -> fake client -> update_response, pumping the event loop until drawn.
+    for stream in (False, True):
+        root, app = make_app(module)
+        app.stream_responses = stream
+        for size in sizes:
+            frame = app.create_new_tab()
+            fill_transcript(frame, size)
+            app.insert_prompt(frame)
+            pump(root)
+            start = time.perf_counter()
+            for turn in range(turns):
+                frame.text_area.insert("end", f"benchmark question {turn}")
+                app.on_return(None, frame)
+                pump(root, until=lambda: not frame.pending)
+                check_reply_placement(app, frame)
+            results.add("on_return_round_trip", time.perf_counter() - start, turns,
+                        transcript_bytes=size, stream=stream)
+        app.scheduler.shutdown()
+        root.destroy()
+
+
+def write_chat_files(module, directory, count):
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    for i in range(count - 1):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"Message {i}: " + "lorem ipsum dolor sit amet " * 8})
+    v1_path = os.path.join(directory, f"chat-{count}-v1.lpt")
+    with open(v1_path, "w", encoding="utf-8") as f:
+        json.dump(messages, f, indent=2)
+    v2_path = os.path.join(directory, f"chat-{count}-v2.lpt")
+    writer = module.JournalWriter()
+    journal = module.ChatJournal(v2_path, writer)
+    writer.call(lambda: journal.write_all(messages))
+    journal.close()
+    writer.flush()
+    return {"v1": v1_path, "v2": v2_path}
+
+
+def check_empty_journals(module, directory):
+    # A closed journal with no messages, or with all of them truncated, has an empty tail index.
+    writer = module.JournalWriter()
+    for name, messages in (("empty", []), ("truncated", [{"role": "user", "content": "dropped"}])):
+        path = os.path.join(directory, f"chat-{name}.lpt")
+        journal = module.ChatJournal(path, writer)
+        writer.call(lambda: journal.write_all(messages))
+        if messages:
+            journal.truncate(0)
+        journal.close()
+        writer.flush()
+        if module.read_lpt_tail(path, 10) != ([], 0):
+            raise SystemExit(f"read_lpt_tail misread the {name} journal: {module.read_lpt_tail(path, 10)!r}")
+
+
+def bench_open_chat(module, results, counts=(1000, 10000, 100000)):
+    root, app = make_app(module)
+    with tempfile.TemporaryDirectory() as directory:
+        check_empty_journals(module, directory)
+        for count in counts:
+            for version, path in write_chat_files(module, directory, count).items():
+                size = os.path.getsize(path)
+                start = time.perf_counter()
+                app.open_chat(path)
+                frame = app.notebook.nametowidget(app.notebook.select())
+                root.update_idletasks()
+                shown = time.perf_counter() - start
+                pump(root, until=lambda: frame.history_ready.is_set() and
+                     frame.rendered_from <= max(0, len(frame.messages) - app.lazy_render_messages))
+                settled = time.perf_counter() - start
+                results.add("open_chat_first_paint", shown, messages=count, format=version, file_bytes=size)
+                results.add("open_chat_settled", settled, messages=count, format=version, file_bytes=size)
+                app.notebook.forget(frame)
+                frame.destroy()
+    root.destroy()
+
+
+def legacy_ascii_art(img, new_width=80):
+    # The previous per-pixel implementation of generate_ascii_art.
+    img = img.convert("L")
+    width, height = img.size
+    new_height = int(height / width * new_width * 0.55)
+    img = img.resize((new_width, new_height))
+    ascii_chars = "@%#*+=-:. "
+    ascii_str = ""
+    for i, pixel in enumerate(img.getdata()):
+        ascii_str += ascii_chars[int(pixel / 256 * len(ascii_chars))]
+        if (i + 1) % new_width == 0:
+            ascii_str += "\n"
+    return ascii_str
+
+
+def bench_ascii_art(module, results, widths=(80, 160, 320), runs=20):
+    from PIL import Image
+    img = Image.effect_noise((512, 512), 64).convert("RGB")
+    for width in widths:
+        start = time.perf_counter()
+        for _ in range(runs):
+            legacy_ascii_art(img, width)
+        results.add("generate_ascii_art", time.perf_counter() - start, runs, mode="legacy", width=width)
+        start = time.perf_counter()
+        for _ in range(runs):
+            module.ascii_art_cache.clear()
+            module.render_ascii_art(img, width)
+        results.add("generate_ascii_art", time.perf_counter() - start, runs, mode="vectorized", width=width)
+        start = time.perf_counter()
+        for _ in range(runs):
+            module.render_ascii_art(img, width)
+        results.add("generate_ascii_art", time.perf_counter() - start, runs, mode="cached", width=width)
+
+
+def bench_update_all_tabs_font(module, results, tabs=50, runs=10):
+    root, app = make_app(module)
+    for _ in range(tabs - 1):
+        frame = app.create_new_tab()
+        fill_transcript(frame, 64 * 1024)
+    root.update_idletasks()
+    start = time.perf_counter()
+    for run in range(runs):
+        app.custom_font_size = 12 + run % 2 * 4
+        app.use_default_scaling = False
+        app.update_all_tabs_font()
+        root.update_idletasks()
+    results.add("update_all_tabs_font", time.perf_counter() - start, runs, tabs=tabs)
+    root.destroy()
+
+
+def bench_image_stall(module, results, images=6, size=2048):
+    # Main-loop stall (from the app's own heartbeat) while /image results are converted to ASCII.
+    for workers in (0, None):
+        root, app = make_app(module, FakeClient(image_size=size))
+        app.image_display_mode = "inline"
+        app.image_workers = module.ImageWorkerPool(max_workers=workers)
+        frame = current_tab(app)
+        pump(root)
+        app.telemetry.reset()
+        start = time.perf_counter()
+        for i in range(images):
+            frame.text_area.insert("end", f"/image benchmark picture {i}")
+            app.on_return(None, frame)
+        pump(root, until=lambda: not frame.pending)
+        elapsed = time.perf_counter() - start
+        count, p50, p95, p99, worst = app.telemetry.summary()["heartbeat"]
+        results.add("image_ascii_stall", elapsed, images, processes=app.image_workers.max_workers,
+                    heartbeat_p99_ms=round((p99 or 0) * 1000, 2), heartbeat_max_ms=round((worst or 0) * 1000, 2))
+        app.image_workers.shutdown()
+        app.scheduler.shutdown()
+        root.destroy()
+
+
+BENCHMARKS = {
+    "create_new_tab": bench_create_new_tab,
+    "update_response": bench_update_response,
+    "round_trip": bench_round_trip,
+    "open_chat": bench_open_chat,
+    "ascii_art": bench_ascii_art,
+    "image_stall": bench_image_stall,
+    "update_all_tabs_font": bench_update_all_tabs_font,
+}
+
+
+def ensure_display():
+    # Tk needs an X server; start a virtual one when running headless (e.g. in CI).
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise SystemExit("No DISPLAY and Xvfb is not installed; run under xvfb-run or set DISPLAY.")
+    display = ":99"
+    process = subprocess.Popen([xvfb, display, "-screen", "0", "1280x1024x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatLPT UI hot-path benchmarks")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS),
+                        help="run only this benchmark (may be repeated)")
+    parser.add_argument("--json", metavar="PATH", help="write results to PATH instead of stdout")
+    args = parser.parse_args()
+
+    xvfb = ensure_display() if set(args.only or BENCHMARKS) != {"ascii_art"} else None
+    module = load_app_module()
+    results = BenchResults()
+    workdir = os.getcwd()
+    # Config, autosave and cache directories are relative to the working directory.
+    with tempfile.TemporaryDirectory() as sandbox:
+        os.chdir(sandbox)
+        try:
+            for name in args.only or BENCHMARKS:
+                BENCHMARKS[name](module, results)
+        finally:
+            os.chdir(workdir)
+            if xvfb is not None:
+                xvfb.terminate()
+    report = json.dumps(results.to_json(), indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import base64
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import chatlpt_bench
+
+MOCK_MODELS = ("gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini", "dall-e-2", "dall-e-3")
+LOREM = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua").split()
+
+
+def make_png(size=512):
+    # A grayscale gradient, encoded by hand so the server needs nothing outside the stdlib.
+    rows = b"".join(b"\x00" + bytes((x + y) * 255 // (2 * size - 2) for x in range(size)) for y in range(size))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+class MockSettings:
+    def __init__(self, latency=0.2, jitter=0.05, token_rate=50.0, reply_tokens=60,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, image_latency=1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.image_latency = image_latency
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def delay(self, seconds):
+        settings = self.server.settings
+        time.sleep(max(0.0, seconds + random.uniform(-settings.jitter, settings.jitter)))
+
+    def send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, kind, headers=()):
+        self.server.stats.count(f"status_{status}")
+        self.send_json(status, {"error": {"message": message, "type": kind, "code": None}}, headers)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def inject_failure(self):
+        # Returns True if an injected 429 or 500 was sent instead of a real response.
+        settings = self.server.settings
+        roll = random.random()
+        if roll < settings.rate_limit_rate:
+            self.send_error_json(429, "Rate limit reached (mock)", "rate_limit_exceeded",
+                                 [("Retry-After", f"{settings.retry_after:g}")])
+            return True
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            self.send_error_json(500, "Internal server error (mock)", "server_error")
+            return True
+        return False
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        self.server.stats.count("GET /v1/images/files" if path.startswith("/v1/images/files/") else f"GET {path}")
+        if path == "/v1/models":
+            self.delay(self.server.settings.latency)
+            models = [{"id": name, "object": "model", "created": 0, "owned_by": "mock"} for name in MOCK_MODELS]
+            self.send_json(200, {"object": "list", "data": models})
+        elif path.startswith("/v1/images/files/"):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(self.server.png)))
+            self.end_headers()
+            self.wfile.write(self.server.png)
+        else:
+            self.send_error_json(404, f"Unknown path {path}", "invalid_request_error")
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        self.server.stats.count(f"POST {path}")
+        try:
+            body = self.read_json()
+        except ValueError:
+            self.send_error_json(400, "Request body is not valid JSON", "invalid_request_error")
+            return
+        if path == "/v1/chat/completions":
+            self.delay(self.server.settings.latency)
+            if not self.inject_failure():
+                self.chat_completion(body)
+        elif path == "/v1/images/generations":
+            self.delay(self.server.settings.image_latency)
+            if not self.inject_failure():
+                self.image_generation(body)
+        else:
+            self.send_error_json(404, f"Unknown path {path}", "invalid_request_error")
+
+    def reply_words(self, body):
+        count = self.server.settings.reply_tokens
+        last = next((m.get("content", "") for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        words = [f"[mock {body.get('model', '')}]"] + last.split()[:8]
+        while len(words) < count:
+            words.append(random.choice(LOREM))
+        return words
+
+    def chat_completion(self, body):
+        words = self.reply_words(body)
+        cid = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "gpt-3.5-turbo")
+        token_delay = 1.0 / self.server.settings.token_rate if self.server.settings.token_rate > 0 else 0.0
+        if not body.get("stream"):
+            time.sleep(token_delay * len(words))
+            self.send_json(200, {
+                "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, word in enumerate(words):
+                if token_delay:
+                    time.sleep(token_delay)
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                self.send_event({"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                                 "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            self.send_event({"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.stats.count("client_disconnects")  # The app cancelled mid-stream.
+            self.close_connection = True
+
+    def send_event(self, payload):
+        self.send_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def image_generation(self, body):
+        if body.get("response_format") == "b64_json":
+            item = {"b64_json": base64.b64encode(self.server.png).decode("ascii")}
+        else:
+            host = self.headers.get("Host") or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+            item = {"url": f"http://{host}/v1/images/files/{uuid.uuid4().hex}.png"}
+        item["revised_prompt"] = body.get("prompt", "")
+        self.send_json(200, {"created": int(time.time()), "data": [item] * int(body.get("n") or 1)})
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings, verbose=False):
+        super().__init__(address, MockHandler)
+        self.settings = settings
+        self.stats = MockStats()
+        self.verbose = verbose
+        self.png = make_png()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_server(settings, host="127.0.0.1", port=0, verbose=False):
+    server = MockServer((host, port), settings, verbose)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StallMonitor:
+    # Schedules an after() heartbeat and records how late each one fires. Percentiles come
+    # from the app's own helper so this report matches its Performance window.
+    def __init__(self, root, percentile, interval_ms=10):
+        self.root = root
+        self.percentile = percentile
+        self.interval = interval_ms / 1000
+        self.last = None
+        self.stalls = []
+
+    def start(self):
+        self.last = time.perf_counter()
+        self.root.after(int(self.interval * 1000), self.beat)
+
+    def beat(self):
+        now = time.perf_counter()
+        self.stalls.append(max(0.0, now - self.last - self.interval))
+        self.last = now
+        self.root.after(int(self.interval * 1000), self.beat)
+
+    def summary(self):
+        return {
+            "heartbeats": len(self.stalls),
+            "total_stall_s": sum(self.stalls),
+            "max_stall_ms": max(self.stalls, default=0.0) * 1000,
+            "p99_stall_ms": (self.percentile(self.stalls, 99) or 0.0) * 1000,
+        }
+
+
+def run_load(server, tabs, turns, stream, image_every, workers, per_model):
+    # Drives the real app (OpenAI client and image download included) from a withdrawn Tk root.
+    xvfb = chatlpt_bench.ensure_display()
+    module = chatlpt_bench.load_app_module()
+    workdir = os.getcwd()
+    with tempfile.TemporaryDirectory() as sandbox:
+        os.chdir(sandbox)
+        try:
+            root, app = chatlpt_bench.make_app(module)
+            app.client = None
+            app.api_base_url = server.base_url
+            app.stream_responses = stream
+            app.image_display_mode = "inline"
+            app.scheduler.max_workers = workers
+            app.scheduler.per_model_limit = per_model
+            frames = [chatlpt_bench.current_tab(app)] + [app.create_new_tab(f"Load {i}") for i in range(1, tabs)]
+            remaining = {frame: turns for frame in frames}
+            started = {}
+            latencies = []
+            monitor = StallMonitor(root, module.percentile)
+            monitor.start()
+            start = time.perf_counter()
+            while remaining or started:
+                for frame in list(remaining):
+                    if frame in started:
+                        continue
+                    turn = turns - remaining[frame]
+                    if image_every and turn % image_every == image_every - 1:
+                        command = f"/image load test picture {turn}"
+                    else:
+                        command = f"load test question {turn}"
+                    frame.text_area.insert("end", command)
+                    app.on_return(None, frame)
+                    started[frame] = time.perf_counter()
+                    remaining[frame] -= 1
+                    if not remaining[frame]:
+                        del remaining[frame]
+                root.update()
+                for frame in [f for f in started if not f.pending]:
+                    latencies.append(time.perf_counter() - started.pop(frame))
+                time.sleep(0.001)
+            elapsed = time.perf_counter() - start
+            telemetry = {metric: dict(zip(("count", "p50", "p95", "p99", "max"), row))
+                         for metric, row in app.telemetry.summary().items()}
+            app.scheduler.shutdown()
+            root.destroy()
+        finally:
+            os.chdir(workdir)
+            if xvfb is not None:
+                xvfb.terminate()
+    return {
+        "tabs": tabs,
+        "turns_per_tab": turns,
+        "stream": stream,
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {f"p{pct}": module.percentile(latencies, pct) * 1000 if latencies else None for pct in (50, 95, 99)},
+        "ui_stall": monitor.summary(),
+        "server": server.stats.snapshot(),
+        "app_telemetry": telemetry,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI API for ChatLPT load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.05, help="+/- seconds added to each latency")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="tokens per second (0 = instant)")
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--image-latency", type=float, default=1.0)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--load", type=int, metavar="TABS", help="drive TABS simulated tabs, print a report and exit")
+    parser.add_argument("--turns", type=int, default=10, help="prompts per tab in --load mode")
+    parser.add_argument("--stream", action="store_true", help="stream replies in --load mode")
+    parser.add_argument("--image-every", type=int, default=0, metavar="N", help="make every Nth prompt an /image")
+    parser.add_argument("--workers", type=int, default=4, help="scheduler workers in --load mode")
+    parser.add_argument("--per-model", type=int, default=2, help="per-model concurrency in --load mode")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.token_rate, args.reply_tokens,
+                            args.error_rate, args.rate_limit_rate, args.retry_after, args.image_latency)
+    if args.load:
+        server = start_server(settings, args.host, 0, args.verbose)
+        report = run_load(server, args.load, args.turns, args.stream, args.image_every, args.workers, args.per_model)
+        server.shutdown()
+        print(json.dumps(report, indent=2))
+        return
+    server = MockServer((args.host, args.port), settings, args.verbose)
+    print(f"Mock OpenAI API listening on {server.base_url}", file=sys.stderr)
+    print(f"Set \"api_base_url\": \"{server.base_url}\" in chatlpt_config.json to use it.", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot(), indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()